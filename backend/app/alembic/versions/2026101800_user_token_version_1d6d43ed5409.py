@@ -0,0 +1,27 @@
+"""user token version
+
+Revision ID: 1d6d43ed5409
+Revises: 880fbc3fab2d
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "1d6d43ed5409"
+down_revision = "880fbc3fab2d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "user",
+        sa.Column("token_version", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("user", "token_version")
@@ -0,0 +1,50 @@
+"""keyset pagination indexes
+
+Revision ID: 33abfab1da1e
+Revises: 1d6d43ed5409
+Create Date: 2026-10-18 09:01:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "33abfab1da1e"
+down_revision = "1d6d43ed5409"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build the indexes without locking the tables against writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_item_created_at_id",
+            "item",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_user_created_at_id",
+            "user",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_user_created_at_id",
+            table_name="user",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_item_created_at_id",
+            table_name="item",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,65 @@
+"""item owner index, drop redundant primary key indexes
+
+Revision ID: 8bd28036176c
+Revises: 33abfab1da1e
+Create Date: 2026-10-18 09:02:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "8bd28036176c"
+down_revision = "33abfab1da1e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build the indexes without locking the tables against writes
+    with op.get_context().autocommit_block():
+        # Serves list_by_owner and the cascade delete of a user's items
+        op.create_index(
+            "ix_item_owner_id_created_at_id",
+            "item",
+            ["owner_id", "created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # Duplicates of the primary key indexes
+        op.drop_index(
+            "ix_item_id",
+            table_name="item",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_user_id",
+            table_name="user",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_id",
+            "user",
+            ["id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_item_id",
+            "item",
+            ["id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_item_owner_id_created_at_id",
+            table_name="item",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
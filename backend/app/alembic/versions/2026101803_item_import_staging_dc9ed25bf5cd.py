@@ -0,0 +1,38 @@
+"""item import staging table
+
+Revision ID: dc9ed25bf5cd
+Revises: 8bd28036176c
+Create Date: 2026-10-18 09:03:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "dc9ed25bf5cd"
+down_revision = "8bd28036176c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "item_import",
+        sa.Column("id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("job_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("title", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        prefixes=["UNLOGGED"],
+    )
+    op.create_index(
+        op.f("ix_item_import_job_id"), "item_import", ["job_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_item_import_job_id"), table_name="item_import")
+    op.drop_table("item_import")
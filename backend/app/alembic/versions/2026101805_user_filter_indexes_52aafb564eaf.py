@@ -0,0 +1,56 @@
+"""user filter indexes
+
+Revision ID: 52aafb564eaf
+Revises: 828475ebe245
+Create Date: 2026-10-18 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "52aafb564eaf"
+down_revision = "828475ebe245"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build the indexes without locking the table against writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_lower_email_pattern",
+            "user",
+            [sa.text("lower(email) text_pattern_ops")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_user_inactive_created_at_id",
+            "user",
+            ["created_at", "id"],
+            postgresql_where=sa.text("NOT is_active"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_user_superuser_created_at_id",
+            "user",
+            ["created_at", "id"],
+            postgresql_where=sa.text("is_superuser"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in [
+            "ix_user_superuser_created_at_id",
+            "ix_user_inactive_created_at_id",
+            "ix_user_lower_email_pattern",
+        ]:
+            op.drop_index(
+                name, table_name="user", postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,90 @@
+"""case-insensitive unique user emails
+
+Revision ID: 2717e65b29dc
+Revises: 52aafb564eaf
+Create Date: 2026-10-18 09:06:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "2717e65b29dc"
+down_revision = "52aafb564eaf"
+branch_labels = None
+depends_on = None
+
+# Users whose email differs only in case from the email of another user, with
+# the user kept in their place: superusers, then active users, then the oldest
+DUPLICATES = """
+SELECT id, keep_id FROM (
+    SELECT id, first_value(id) OVER (
+        PARTITION BY lower(email)
+        ORDER BY is_superuser DESC, is_active DESC, created_at, id
+    ) AS keep_id
+    FROM "user"
+) AS ranked
+WHERE id <> keep_id
+"""
+
+
+def upgrade():
+    op.execute(
+        "UPDATE item SET owner_id = duplicate.keep_id "
+        f"FROM ({DUPLICATES}) AS duplicate WHERE item.owner_id = duplicate.id"
+    )
+    op.execute(
+        f'DELETE FROM "user" USING ({DUPLICATES}) AS duplicate '
+        'WHERE "user".id = duplicate.id'
+    )
+    op.execute('UPDATE "user" SET email = lower(email) WHERE email <> lower(email)')
+    # Build the index without locking the table against writes. The prefix
+    # filter of read_users moves to it.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_lower_email",
+            "user",
+            [sa.text("lower(email) text_pattern_ops")],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_user_lower_email_pattern",
+            table_name="user",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_user_email",
+            table_name="user",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade():
+    # Merged duplicates are not restored
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_email",
+            "user",
+            ["email"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_user_lower_email_pattern",
+            "user",
+            [sa.text("lower(email) text_pattern_ops")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_user_lower_email",
+            table_name="user",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,39 @@
+"""per-owner item counts
+
+Revision ID: b5e1c7a93d42
+Revises: 2717e65b29dc
+Create Date: 2026-10-18 09:07:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "b5e1c7a93d42"
+down_revision = "2717e65b29dc"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "item_count",
+        sa.Column("owner_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("owner_id"),
+    )
+    # Hold item writes until the migration commits, so that none is missed by
+    # the backfill
+    op.execute("LOCK TABLE item IN SHARE MODE")
+    op.execute(
+        "INSERT INTO item_count (owner_id, count) "
+        "SELECT owner_id, count(*) FROM item "
+        "WHERE owner_id IS NOT NULL GROUP BY owner_id"
+    )
+
+
+def downgrade():
+    op.drop_table("item_count")
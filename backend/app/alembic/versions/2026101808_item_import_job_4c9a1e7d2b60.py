@@ -0,0 +1,39 @@
+"""owners of background item imports
+
+Revision ID: 4c9a1e7d2b60
+Revises: b5e1c7a93d42
+Create Date: 2026-10-18 09:08:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "4c9a1e7d2b60"
+down_revision = "b5e1c7a93d42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "item_import_job",
+        sa.Column("id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("owner_id", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_item_import_job_created_at"),
+        "item_import_job",
+        ["created_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_item_import_job_created_at"), table_name="item_import_job")
+    op.drop_table("item_import_job")
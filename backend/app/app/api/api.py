@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from app.api.routers import auth, items, users
+from app.api.routers import auth, internal, items, users
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(items.router, prefix="/items", tags=["items"])
+api_router.include_router(internal.router, prefix="/internal", tags=["internal"])
@@ -1,8 +1,10 @@
+import logging
 from collections.abc import AsyncGenerator
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from redis.exceptions import RedisError
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api.utils import (
@@ -11,42 +13,100 @@ from app.api.utils import (
     no_permissions_exception,
     user_not_found_exception,
 )
-from app.core.token_utils import TokenType, decode_token
+from app.core.config import settings
+from app.core.token_utils import TokenType, decode_token_payload
+from app.core.token_versions import token_versions
+from app.crud.user import user_cache
+from app.db.admission import Priority, admission
 from app.db.session import SessionLocal
+from app.models.auth import UserClaims
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with SessionLocal() as session:
+
+async def get_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Open a session once the request is admitted by `admission`."""
+    priority = getattr(request.state, "priority", Priority.NORMAL)
+    async with admission.admit(priority), SessionLocal() as session:
         yield session
 
 
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
+
+
+def mark_heavy(request: Request) -> None:
+    """Admit the database work of the request after that of the others.
+
+    Used as a dependency of the route, which is solved before `get_session`.
+    """
+    request.state.priority = Priority.HEAVY
+
+
+HeavyRequest = Depends(mark_heavy)
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="auth/access-token")
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 FormDataDep = Annotated[OAuth2PasswordRequestForm, Depends()]
 
 
-async def get_current_user(session: SessionDep, token: TokenDep) -> User:
-    if user_id := decode_token(token, TokenType.ACCESS):
-        if user := await session.get(User, user_id):
-            return user
+async def get_current_user(session: SessionDep, token: TokenDep) -> UserClaims:
+    """Return the flags of the user authenticated by the access token.
+
+    Tokens issued with ACCESS_TOKEN_CLAIMS carry the flags themselves and are
+    only checked against the revoked token versions, or against the user row
+    while Redis is unreachable. For other tokens the user is loaded from the
+    database, unless it is in `user_cache`.
+    """
+    payload = decode_token_payload(token, TokenType.ACCESS)
+    if payload is None:
+        raise credentials_exception
+    if settings.ACCESS_TOKEN_CLAIMS and payload.ver is not None:
+        try:
+            version = await token_versions.get(payload.sub)
+        except RedisError:
+            logger.exception("Failed to read the token version of %s", payload.sub)
+        else:
+            if payload.ver < version:
+                raise credentials_exception
+            return UserClaims(
+                id=payload.sub,
+                is_active=payload.is_active,
+                is_superuser=payload.is_superuser,
+            )
+    elif claims := user_cache.get(payload.sub):
+        return claims
+    user = await session.get(User, payload.sub)
+    if user is None:
         raise user_not_found_exception
-    raise credentials_exception
+    if payload.ver is not None and payload.ver < user.token_version:
+        raise credentials_exception
+    claims = UserClaims.model_validate(user)
+    user_cache.set(payload.sub, claims)
+    return claims
 
 
 async def get_current_active_user(
-    current_user: Annotated[User, Depends(get_current_user)],
-) -> User:
+    current_user: Annotated[UserClaims, Depends(get_current_user)],
+) -> UserClaims:
     if not current_user.is_active:
         raise inactive_user_exception
     return current_user
 
 
-CurrentUser = Annotated[User, Depends(get_current_active_user)]
+CurrentUser = Annotated[UserClaims, Depends(get_current_active_user)]
 
 
-async def get_current_superuser(current_user: CurrentUser) -> User:
+async def get_current_superuser(current_user: CurrentUser) -> UserClaims:
     if not current_user.is_superuser:
         raise no_permissions_exception
     return current_user
+
+
+async def get_current_user_row(session: SessionDep, current_user: CurrentUser) -> User:
+    """Load the full row of the current user, for handlers that need it."""
+    if user := await session.get(User, current_user.id):
+        return user
+    raise user_not_found_exception
+
+
+CurrentUserRow = Annotated[User, Depends(get_current_user_row)]
@@ -13,9 +13,11 @@ from app.api.utils import (
 from app.core.token_utils import (
     TokenType,
     decode_token,
+    decode_token_payload,
     generate_password_reset_validation_token,
     generate_registration_validation_token,
     generate_tokens_response,
+    user_claims,
 )
 from app.crud.user import crud_user
 from app.models.auth import NewPassword, RefreshTokenRequest, TokensResponse
@@ -40,7 +42,7 @@ async def login_access_token(
         )
     if not user.is_active:
         raise inactive_user_exception
-    return generate_tokens_response(user.id)
+    return generate_tokens_response(user.id, user_claims(user))
 
 
 @router.post("/refresh-token")
@@ -48,10 +50,15 @@ async def refresh_token(
     session: SessionDep, token: RefreshTokenRequest
 ) -> TokensResponse:
     """Get an access token using a refresh token."""
-    user_id = decode_token(token.refresh_token, TokenType.REFRESH)
-    if session.get(User, user_id):
-        return generate_tokens_response(user_id)
-    raise credentials_exception
+    payload = decode_token_payload(token.refresh_token, TokenType.REFRESH)
+    if not payload:
+        raise credentials_exception
+    user = await session.get(User, payload.sub)
+    if not user or (payload.ver is not None and payload.ver < user.token_version):
+        raise credentials_exception
+    if not user.is_active:
+        raise inactive_user_exception
+    return generate_tokens_response(user.id, user_claims(user))
 
 
 @router.post("/registration")
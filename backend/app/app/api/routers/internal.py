@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_current_superuser
+from app.core.security import password_hasher
+from app.core.singleflight import single_flight
+from app.core.token_utils import token_cache
+from app.crud.item_cache import item_cache
+from app.crud.user import user_cache
+from app.db.admission import admission
+from app.db.pool import pool_metrics
+from app.db.session import engine
+from app.models.internal import (
+    AdmissionStats,
+    CacheStats,
+    ItemCacheStats,
+    PasswordHasherStats,
+    PoolStats,
+    SingleFlightStats,
+)
+
+# Only superuser can access the internal endpoints
+router = APIRouter(dependencies=[Depends(get_current_superuser)])
+
+
+@router.get("/password-hasher")
+async def read_password_hasher_stats() -> PasswordHasherStats:
+    """Return password hashing pool usage."""
+    return password_hasher.stats()
+
+
+@router.get("/user-cache")
+async def read_user_cache_stats() -> CacheStats:
+    """Return authenticated user cache usage."""
+    return user_cache.stats()
+
+
+@router.get("/token-cache")
+async def read_token_cache_stats() -> CacheStats:
+    """Return verified token cache usage."""
+    return token_cache.stats()
+
+
+@router.get("/item-cache")
+async def read_item_cache_stats() -> ItemCacheStats:
+    """Return item cache usage."""
+    return item_cache.stats()
+
+
+@router.get("/single-flight")
+async def read_single_flight_stats() -> SingleFlightStats:
+    """Return the number of reads coalesced with identical concurrent ones."""
+    return single_flight.stats()
+
+
+@router.get("/pool")
+async def read_pool_stats() -> PoolStats:
+    """Return database connection pool usage, checkout waits and churn."""
+    return pool_metrics.stats(engine.pool)
+
+
+@router.get("/admission")
+async def read_admission_stats() -> AdmissionStats:
+    """Return the requests admitted, queued and rejected for database work."""
+    return admission.stats()
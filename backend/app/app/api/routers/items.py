@@ -1,10 +1,48 @@
+import csv
+import io
+from collections.abc import AsyncIterator
+from functools import partial
+from typing import Annotated, Any, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Query, status
+from fastapi import APIRouter, Body, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, HeavyRequest, SessionDep
+from app.api.utils import (
+    FieldsQuery,
+    conditional_response,
+    dump_json,
+    if_match_versions,
+    import_job_not_found_exception,
+    json_response,
+    list_etag,
+    sparse_schema,
+    validator_headers,
+    version_etag,
+)
+from app.core.celery_app import get_task_info
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.crud import item_import
 from app.crud.item import crud_item
-from app.models.item import ItemCreate, ItemOut, ItemUpdate
+from app.db.admission import Priority, admission
+from app.db.session import SessionLocal
+from app.models.auth import UserClaims
+from app.models.item import (
+    BulkError,
+    ItemBulkDeleteOut,
+    ItemBulkOut,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemOut,
+    ItemOutWithOwner,
+    ItemUpdate,
+)
+from app.models.item_import import ItemImportOut
+from app.models.page import Page
 
 router = APIRouter()
 
@@ -16,39 +54,339 @@ async def create_item_for_user(
     return await crud_item.create_with_owner(session, item, current_user.id)
 
 
-@router.get("/")
-async def read_items(
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def create_items_for_user(
+    session: SessionDep,
+    current_user: CurrentUser,
+    items: Annotated[list[dict[str, Any]], Body(max_length=settings.BULK_MAX_ITEMS)],
+) -> ItemBulkOut:
+    """Create items in one transaction. Invalid items are reported as errors."""
+    items_in, errors = [], []
+    for index, data in enumerate(items):
+        try:
+            items_in.append(ItemCreate.model_validate(data))
+        except ValidationError as e:
+            detail = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors()
+            )
+            errors.append(BulkError(index=index, detail=detail))
+    created = await crud_item.bulk_create_with_owner(session, items_in, current_user.id)
+    return ItemBulkOut(items=created, errors=errors)
+
+
+@router.patch("/bulk")
+async def update_items(
+    session: SessionDep,
+    current_user: CurrentUser,
+    items: Annotated[list[ItemBulkUpdate], Body(max_length=settings.BULK_MAX_ITEMS)],
+) -> ItemBulkOut:
+    """Update items in one transaction.
+
+    Items which do not exist or which the user does not own are reported as
+    errors and left out.
+    """
+    updated, errors = await crud_item.bulk_update_by_owner(session, items, current_user)
+    return ItemBulkOut(items=updated, errors=errors)
+
+
+@router.delete("/bulk")
+async def delete_items(
+    session: SessionDep,
+    current_user: CurrentUser,
+    ids: Annotated[list[UUID], Body(max_length=settings.BULK_MAX_ITEMS)],
+) -> ItemBulkDeleteOut:
+    """Delete items in one transaction, reporting errors as for updates."""
+    deleted, errors = await crud_item.bulk_delete_by_owner(session, ids, current_user)
+    return ItemBulkDeleteOut(ids=deleted, errors=errors)
+
+
+@router.post("/batch-get")
+async def read_items_by_id(
+    session: SessionDep,
+    current_user: CurrentUser,
+    ids: Annotated[list[UUID], Body(max_length=settings.BULK_MAX_ITEMS)],
+) -> ItemBulkOut:
+    """Retrieve items by ID with one query, reporting errors as for updates."""
+    items, errors = await crud_item.get_many_by_owner(session, ids, current_user)
+    return ItemBulkOut(items=items, errors=errors)
+
+
+@router.post(
+    "/import", status_code=status.HTTP_201_CREATED, dependencies=[HeavyRequest]
+)
+async def import_items_for_user(
+    request: Request,
+    session: SessionDep,
+    current_user: CurrentUser,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    background: bool = False,
+) -> ItemImportOut:
+    """Import items from an NDJSON or CSV upload streamed in the request body.
+
+    CSV uploads start with a `title,description` header. Invalid rows are
+    reported as errors, by position in the upload. With `background`, the
+    rows are merged by a Celery task whose status is at `/items/import/{job_id}`.
+    """
+    job_id = uuid7()
+    if background:
+        staged, errors = await item_import.stage_items_for_task(
+            session, job_id, current_user.id, request.stream(), format
+        )
+        item_import.merge_item_import.apply_async(
+            (str(job_id), str(current_user.id)), task_id=str(job_id)
+        )
+        return ItemImportOut(
+            job_id=job_id, status="PENDING", staged=staged, errors=errors
+        )
+    staged, imported, errors = await item_import.import_items(
+        session, job_id, current_user.id, request.stream(), format
+    )
+    return ItemImportOut(
+        job_id=job_id,
+        status="SUCCESS",
+        staged=staged,
+        imported=imported,
+        errors=errors,
+    )
+
+
+@router.get("/import/{job_id}")
+async def read_import_job(
+    session: SessionDep, current_user: CurrentUser, job_id: UUID
+) -> dict[str, Any]:
+    """Retrieve the status of a background import of the user."""
+    job = await item_import.get_job(session, job_id)
+    if job is None or (
+        job.owner_id != current_user.id and not current_user.is_superuser
+    ):
+        raise import_job_not_found_exception
+    return get_task_info(str(job_id))
+
+
+ExpandQuery = Annotated[
+    list[Literal["owner"]], Query(description="Relationships to embed")
+]
+
+
+@router.get(
+    "/",
+    response_model=list[ItemOut]
+    | list[ItemOutWithOwner]
+    | Page[ItemOut]
+    | Page[ItemOutWithOwner],
+    dependencies=[HeavyRequest],
+)
+async def read_items(  # noqa: PLR0913
+    request: Request,
     session: SessionDep,
     current_user: CurrentUser,
     offset: int = 0,
     limit: int = Query(default=100, le=100),
-) -> list[ItemOut]:
-    """Retrieve items. The user can only retrieve their own items."""
-    if current_user.is_superuser:
-        return await crud_item.list(session, offset, limit)
-    return await crud_item.list_by_owner(session, current_user.id, offset, limit)
+    cursor: str | None = None,
+    fields: FieldsQuery = None,
+    expand: ExpandQuery = [],  # noqa: B006
+    total: bool = False,
+) -> Response:
+    """Retrieve items. The user can only retrieve their own items.
 
+    Pass `cursor`, empty for the first page and then the `next_cursor` of the
+    previous page, to get a page of items instead of using `offset`.
 
-@router.get("/{item_id}")
-async def read_item(
-    session: SessionDep, current_user: CurrentUser, item_id: UUID
-) -> ItemOut:
-    """Retrieve item by ID. The user can only retrieve their own item."""
-    return await crud_item.get_by_owner(session, item_id, current_user)
+    Lists without `fields` or `expand` have an ETag, and requests with a
+    matching If-None-Match get 304 Not Modified.
+
+    With `total`, the `X-Total-Count` header gives the number of items of the
+    user, or for superusers `X-Total-Count-Estimate` an estimate of the number
+    of items, from the table statistics.
+    """
+    out_schema = sparse_schema(ItemOutWithOwner if expand else ItemOut, fields)
+    # Relationships are only loaded along with entities
+    projection = (settings.LIST_PROJECTION or fields) and not expand
+    schema = out_schema if projection else None
+    # Only the full item representation has an ETag, which changes with the
+    # items but not with their owners
+    plain = fields is None and not expand
+    first_page = not cursor and (cursor is not None or not offset)
+    if first_page and plain and not current_user.is_superuser:
+        cached = await crud_item.first_page_cached_by_owner(
+            session, current_user.id, limit, paginated=cursor is not None
+        )
+        response = conditional_response(request, lambda: cached.content, cached.etag)
+    elif cursor is not None:
+        if current_user.is_superuser:
+            page = await crud_item.page(
+                session, cursor, limit, schema=schema, expand=expand
+            )
+        else:
+            page = await crud_item.page_by_owner(
+                session, current_user.id, cursor, limit, schema=schema, expand=expand
+            )
+        if plain:
+            etag = list_etag(
+                ((item.id, item.updated_at) for item in page.items), page.next_cursor
+            )
+            response = conditional_response(
+                request, partial(dump_json, Page[out_schema], page), etag
+            )
+        else:
+            response = json_response(Page[out_schema], page)
+    else:
+        if current_user.is_superuser:
+            items = await crud_item.list(
+                session, offset, limit, schema=schema, expand=expand
+            )
+        else:
+            items = await crud_item.list_by_owner(
+                session, current_user.id, offset, limit, schema=schema, expand=expand
+            )
+        if plain:
+            etag = list_etag((item.id, item.updated_at) for item in items)
+            response = conditional_response(
+                request, partial(dump_json, list[out_schema], items), etag
+            )
+        else:
+            response = json_response(list[out_schema], items)
+    if total:
+        await _set_total(response, session, current_user)
+    return response
+
+
+async def _set_total(response: Response, session: AsyncSession, user: UserClaims):
+    if user.is_superuser:
+        count = await crud_item.estimate_count(session)
+        response.headers["X-Total-Count-Estimate"] = str(count)
+    else:
+        count = await crud_item.count_by_owner(session, user.id)
+        response.headers["X-Total-Count"] = str(count)
+
+
+@router.get("/search", dependencies=[HeavyRequest])
+async def search_items(
+    session: SessionDep,
+    current_user: CurrentUser,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=100, le=100),
+    cursor: str | None = None,
+) -> Page[ItemOut]:
+    """Search items by the words of their title and description, most relevant first.
+
+    Titles also match by prefix and with misspellings. Pass `cursor` as for
+    `GET /items/` to get the next pages.
+    """
+    return await crud_item.search(session, current_user, q, cursor, limit)
+
+
+async def _export_items(
+    user: UserClaims, format: Literal["ndjson", "csv"]
+) -> AsyncIterator[str]:
+    # The request session is closed before the response is streamed. The
+    # headers are sent by now, so the export waits for admission instead of
+    # being rejected.
+    async with (
+        admission.admit(Priority.HEAVY, wait=True),
+        SessionLocal() as session,
+    ):
+        fields = list(ItemOut.model_fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format == "csv":
+            writer.writerow(fields)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        async for rows in crud_item.stream_visible(
+            session, user, settings.ITEM_EXPORT_BATCH_SIZE
+        ):
+            if format == "csv":
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield "".join(
+                    ItemOut.model_validate(
+                        dict(zip(fields, row, strict=True))
+                    ).model_dump_json()
+                    + "\n"
+                    for row in rows
+                )
+
+
+@router.get("/export", dependencies=[HeavyRequest])
+async def export_items(
+    current_user: CurrentUser, format: Literal["ndjson", "csv"] = "ndjson"
+) -> StreamingResponse:
+    """Export all the items the user can retrieve, as NDJSON or CSV."""
+    return StreamingResponse(
+        _export_items(current_user, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="items.{format}"'},
+    )
+
+
+@router.get("/{item_id}", response_model=ItemOut | ItemOutWithOwner)
+async def read_item(  # noqa: PLR0913
+    request: Request,
+    session: SessionDep,
+    current_user: CurrentUser,
+    item_id: UUID,
+    fields: FieldsQuery = None,
+    expand: ExpandQuery = [],  # noqa: B006
+) -> Response:
+    """Retrieve item by ID. The user can only retrieve their own item.
+
+    Without `expand`, the item has an ETag and a Last-Modified date, and
+    requests with a matching If-None-Match or If-Modified-Since get 304 Not
+    Modified.
+    """
+    if fields is None and not expand:
+        cached = await crud_item.get_cached_by_owner(session, item_id, current_user)
+        return conditional_response(
+            request,
+            lambda: cached.content,
+            version_etag(cached.updated_at),
+            cached.updated_at,
+        )
+    schema = sparse_schema(ItemOutWithOwner if expand else ItemOut, fields)
+    projection = fields is not None and not expand
+    item = await crud_item.get_by_owner(
+        session, item_id, current_user, schema if projection else None, expand
+    )
+    if expand:
+        # The owner may change without the updated_at of the item
+        return json_response(schema, item)
+    return conditional_response(
+        request,
+        partial(dump_json, schema, item),
+        version_etag(item.updated_at),
+        item.updated_at,
+    )
 
 
 @router.patch("/{item_id}")
-async def update_item(
-    session: SessionDep, current_user: CurrentUser, item_id: UUID, item_in: ItemUpdate
+async def update_item(  # noqa: PLR0913
+    response: Response,
+    session: SessionDep,
+    current_user: CurrentUser,
+    item_id: UUID,
+    item_in: ItemUpdate,
+    if_match: Annotated[str | None, Header()] = None,
 ) -> ItemOut:
-    """Update an item."""
-    item = await crud_item.get_by_owner(session, item_id, current_user)
-    return await crud_item.update(session, item, item_in)
+    """Update an item.
+
+    With If-Match, the item is only updated if its current ETag is one of the
+    given ones, otherwise the response is 412 Precondition Failed.
+    """
+    item = await crud_item.update_by_owner(
+        session, item_id, current_user, item_in, if_match_versions(if_match)
+    )
+    response.headers.update(validator_headers(version_etag(item.updated_at)))
+    return item
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_item(session: SessionDep, current_user: CurrentUser, item_id: UUID):
     """Delete an item."""
-    item = await crud_item.get_by_owner(session, item_id, current_user)
-    await crud_item.delete(session, item)
+    await crud_item.delete_by_owner(session, item_id, current_user)
     return {"msg": "Item deleted"}
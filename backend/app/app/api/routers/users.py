@@ -1,36 +1,67 @@
+from functools import partial
+from typing import Annotated, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 
 from app.api.deps import (
     CurrentUser,
+    CurrentUserRow,
+    HeavyRequest,
     SessionDep,
-    get_current_active_user,
     get_current_superuser,
 )
-from app.api.utils import email_registered_exception, user_not_found_exception
+from app.api.utils import (
+    FieldsQuery,
+    conditional_response,
+    dump_json,
+    email_registered_exception,
+    json_response,
+    no_permissions_exception,
+    sparse_schema,
+    user_not_found_exception,
+    version_etag,
+)
+from app.core.config import settings
 from app.crud.user import crud_user
-from app.models.user import UserCreate, UserOut, UserUpdate
+from app.models.auth import UserClaims
+from app.models.item import UserOutWithItems
+from app.models.page import Page
+from app.models.user import UserCreate, UserFilters, UserOut, UserUpdate
 
 router = APIRouter()
 
 
-@router.get("/me")
-async def read_current_user(current_user: CurrentUser) -> UserOut:
-    """Get current user."""
-    return current_user
+@router.get("/me", response_model=UserOut)
+async def read_current_user(
+    request: Request, session: SessionDep, current_user: CurrentUser
+) -> Response:
+    """Get current user.
+
+    Requests with an If-None-Match or If-Modified-Since matching the ETag or
+    Last-Modified date of the user get 304 Not Modified.
+    """
+    user = await crud_user.get_out(session, current_user.id)
+    if user is None:
+        raise user_not_found_exception
+    return conditional_response(
+        request,
+        partial(dump_json, UserOut, user),
+        version_etag(user.updated_at),
+        user.updated_at,
+    )
 
 
 @router.patch("/me")
 async def update_current_user(
-    session: SessionDep, current_user: CurrentUser, updated_data: UserUpdate
+    session: SessionDep, current_user: CurrentUserRow, updated_data: UserUpdate
 ) -> UserOut:
     """Update current user."""
     return await crud_user.update(session, current_user, updated_data)
 
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_current_user(session: SessionDep, current_user: CurrentUser):
+async def delete_current_user(session: SessionDep, current_user: CurrentUserRow):
     """Delete current user."""
     await crud_user.delete(session, current_user)
     return {"msg": "User deleted"}
@@ -48,16 +79,84 @@ async def create_user(session: SessionDep, user: UserCreate) -> UserOut:
     return await crud_user.create(session, user)
 
 
-@router.get("/", dependencies=[Depends(get_current_active_user)])
-async def read_users(
-    session: SessionDep, offset: int = 0, limit: int = Query(default=100, le=100)
-) -> list[UserOut]:
-    return await crud_user.list(session, offset, limit)
+ExpandQuery = Annotated[
+    list[Literal["items"]],
+    Query(
+        description="Relationships to embed, own `items` unless superuser. Only "
+        f"the first {settings.EXPAND_COLLECTION_LIMIT} items are embedded, all "
+        "of them are listed by `GET /items/`"
+    ),
+]
+
+
+def _check_expand(
+    current_user: UserClaims, expand: list[str], user_id: UUID | None = None
+) -> None:
+    # Items are private to their owner
+    if expand and not current_user.is_superuser and current_user.id != user_id:
+        raise no_permissions_exception
+
+
+@router.get(
+    "/",
+    response_model=list[UserOut]
+    | list[UserOutWithItems]
+    | Page[UserOut]
+    | Page[UserOutWithItems],
+    dependencies=[HeavyRequest],
+)
+async def read_users(  # noqa: PLR0913
+    session: SessionDep,
+    current_user: CurrentUser,
+    filters: Annotated[UserFilters, Depends()],
+    offset: int = 0,
+    limit: int = Query(default=100, le=100),
+    cursor: str | None = None,
+    fields: FieldsQuery = None,
+    expand: ExpandQuery = [],  # noqa: B006
+    estimate_total: bool = False,
+) -> Response:
+    """Retrieve users, by `offset` or by `cursor` as for items.
+
+    Users can be filtered by email prefix, status and creation time. With
+    `estimate_total`, the `X-Total-Count-Estimate` header gives an estimate of
+    the number of matching users, from the table statistics.
+    """
+    _check_expand(current_user, expand)
+    out_schema = sparse_schema(UserOutWithItems if expand else UserOut, fields)
+    projection = (settings.LIST_PROJECTION or fields) and not expand
+    schema = out_schema if projection else None
+    whereclause = crud_user.filter_by(filters)
+    if cursor is not None:
+        page = await crud_user.page(
+            session, cursor, limit, *whereclause, schema=schema, expand=expand
+        )
+        response = json_response(Page[out_schema], page)
+    else:
+        users = await crud_user.list(
+            session, offset, limit, *whereclause, schema=schema, expand=expand
+        )
+        response = json_response(list[out_schema], users)
+    if estimate_total:
+        total = await crud_user.estimate_count(session, *whereclause)
+        response.headers["X-Total-Count-Estimate"] = str(total)
+    return response
 
 
-@router.get("/{user_id}", dependencies=[Depends(get_current_active_user)])
-async def read_user(session: SessionDep, user_id: UUID) -> UserOut:
-    db_obj = await crud_user.get(session, user_id)
+@router.get("/{user_id}", response_model=UserOut | UserOutWithItems)
+async def read_user(
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_id: UUID,
+    fields: FieldsQuery = None,
+    expand: ExpandQuery = [],  # noqa: B006
+) -> Response:
+    _check_expand(current_user, expand, user_id)
+    schema = sparse_schema(UserOutWithItems if expand else UserOut, fields)
+    projection = fields is not None and not expand
+    db_obj = await crud_user.get(
+        session, user_id, schema if projection else None, expand
+    )
     if db_obj is None:
         raise user_not_found_exception
-    return db_obj
+    return json_response(schema, db_obj)
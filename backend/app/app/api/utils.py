@@ -1,4 +1,14 @@
-from fastapi import HTTPException, status
+import hashlib
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from typing import Annotated, Any
+from uuid import UUID
+
+from fastapi import HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, TypeAdapter, computed_field, create_model
+from pydantic.fields import FieldInfo
 
 credentials_exception = HTTPException(
     status.HTTP_401_UNAUTHORIZED,
@@ -29,3 +39,190 @@ email_registered_exception = HTTPException(
 item_not_found_exception = HTTPException(
     status.HTTP_404_NOT_FOUND, detail="Item not found"
 )
+import_job_not_found_exception = HTTPException(
+    status.HTTP_404_NOT_FOUND, detail="Import job not found"
+)
+item_modified_exception = HTTPException(
+    status.HTTP_412_PRECONDITION_FAILED, detail="Item was modified"
+)
+
+
+password_hasher_busy_exception = HTTPException(
+    status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, please retry later",
+    headers={"Retry-After": "1"},
+)
+database_busy_exception = HTTPException(
+    status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, please retry later",
+    headers={"Retry-After": "1"},
+)
+
+
+invalid_cursor_exception = HTTPException(
+    status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor"
+)
+
+
+FieldsQuery = Annotated[
+    str | None, Query(description="Comma-separated fields to return, all by default")
+]
+
+
+def sparse_schema(schema: type[BaseModel], fields: str | None) -> type[BaseModel]:
+    """Narrow `schema` to the comma-separated `fields` of a request.
+
+    Computed fields can be requested as well. The fields they are made of,
+    listed in the `computed_field_sources` of the schema, are then kept but
+    excluded from the output, so that their columns are still selected.
+    """
+    if fields is None:
+        return schema
+    names = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    allowed = [*schema.model_fields, *schema.model_computed_fields]
+    if not names or not names <= set(allowed):
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid fields, allowed: {', '.join(allowed)}",
+        )
+    return _sparse_schema(schema, names)
+
+
+@lru_cache
+def _sparse_schema(schema: type[BaseModel], names: frozenset[str]) -> type[BaseModel]:
+    computed = names & schema.model_computed_fields.keys()
+    sources = getattr(schema, "computed_field_sources", {})
+    hidden = {source for name in computed for source in sources.get(name, ())}
+    model = create_model(
+        f"{schema.__name__}Fields",
+        **{
+            name: (
+                field.annotation,
+                field
+                if name in names
+                else FieldInfo.merge_field_infos(field, exclude=True),
+            )
+            for name, field in schema.model_fields.items()
+            if name in names | hidden
+        },
+    )
+    if not computed:
+        return model
+    return type(
+        model.__name__,
+        (model,),
+        {
+            name: computed_field(schema.model_computed_fields[name].wrapped_property)
+            for name in computed
+        },
+    )
+
+
+@lru_cache
+def type_adapter(type_: Any) -> TypeAdapter:
+    return TypeAdapter(type_)
+
+
+def dump_json(type_: Any, value: Any) -> bytes:
+    """Serialize `value`, rows or objects, as `type_` with a cached adapter."""
+    adapter = type_adapter(type_)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def json_response(type_: Any, value: Any) -> Response:
+    """Serialize `value` as `type_` into a response, see `dump_json`.
+
+    The returned response bypasses the validation and serialization of the
+    response model by FastAPI, which the adapter does once.
+    """
+    return Response(dump_json(type_, value), media_type="application/json")
+
+
+EPOCH = datetime(1970, 1, 1)  # noqa: DTZ001
+
+
+def version_etag(updated_at: datetime) -> str:
+    """Return the weak ETag of a resource, from its naive UTC `updated_at`."""
+    return f'W/"{(updated_at - EPOCH) // timedelta(microseconds=1):x}"'
+
+
+def etag_version(etag: str) -> datetime | None:
+    """Return the `updated_at` of a `version_etag`, None if it is not one."""
+    opaque = etag.strip().removeprefix("W/").strip('"')
+    try:
+        return EPOCH + timedelta(microseconds=int(opaque, 16))
+    except (ValueError, OverflowError):
+        return None
+
+
+def list_etag(
+    versions: Iterable[tuple[UUID, datetime]], next_cursor: str | None = None
+) -> str:
+    """Return the weak ETag of a list, from the `(id, updated_at)` of its rows.
+
+    Unlike a maximum of `updated_at`, the tag also changes when a row leaves
+    the list.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for row_id, updated_at in versions:
+        digest.update(row_id.bytes + updated_at.isoformat().encode())
+    digest.update((next_cursor or "").encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _etags(header: str) -> list[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+def not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """Evaluate If-None-Match, or else If-Modified-Since, with weak comparison."""
+    if if_none_match := request.headers.get("If-None-Match"):
+        tags = _etags(if_none_match)
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates have a resolution of one second
+        return last_modified.replace(microsecond=0, tzinfo=UTC) <= since
+    return False
+
+
+def if_match_versions(if_match: str | None) -> list[datetime] | None:
+    """Return the `updated_at` values allowed by If-Match, None for any."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    return [version for tag in _etags(if_match) if (version := etag_version(tag))]
+
+
+def validator_headers(
+    etag: str, last_modified: datetime | None = None
+) -> dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=UTC), usegmt=True
+        )
+    return headers
+
+
+def conditional_response(
+    request: Request,
+    content: Callable[[], bytes],
+    etag: str,
+    last_modified: datetime | None = None,
+) -> Response:
+    """Return 304 if the client has the current representation, else the JSON.
+
+    `content` is only called, to serialize the body, when it is sent.
+    """
+    headers = validator_headers(etag, last_modified)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content(), media_type="application/json", headers=headers)
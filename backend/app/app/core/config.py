@@ -18,7 +18,13 @@ import tomllib
 from pathlib import Path
 from typing import Literal
 
-from pydantic import AnyHttpUrl, EmailStr, PostgresDsn, field_validator
+from pydantic import (
+    AnyHttpUrl,
+    EmailStr,
+    PostgresDsn,
+    field_validator,
+    model_validator,
+)
 from pydantic_core.core_schema import ValidationInfo
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -33,10 +39,47 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ENVIRONMENT: Literal["DEV", "PYTEST", "STG", "PRD"] = "DEV"
     SECURITY_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASHER_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHER_WORKERS: int = 4
+    PASSWORD_HASHER_MAX_PENDING: int = 64
 
     ACCESS_TOKEN_EXPIRE_HOURS: int = 24 * 7
     REFRESH_TOKEN_EXPIRE_HOURS: int = 24 * 28
     EMAIL_VALIDATION_TOKEN_EXPIRE_HOURS: int = 24
+    # Embed user flags in access tokens so that requests skip the user lookup.
+    # Requires REDIS_URL, for every worker to see the revoked tokens.
+    ACCESS_TOKEN_CLAIMS: bool = False
+    # Cache of authenticated users, used when ACCESS_TOKEN_CLAIMS is disabled
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL_SECONDS: float = 30
+    # Cache of verified tokens, kept until they expire
+    TOKEN_CACHE_SIZE: int = 10_000
+
+    # Maximum number of items in a bulk request
+    BULK_MAX_ITEMS: int = 1000
+    # Rows copied per batch and errors reported by item imports
+    ITEM_IMPORT_BATCH_SIZE: int = 5000
+    ITEM_IMPORT_MAX_ERRORS: int = 100
+    # Background imports are forgotten after a day, as Celery results, along
+    # with the staged rows of the tasks which never ran
+    ITEM_IMPORT_JOB_EXPIRE_SECONDS: int = 24 * 3600
+    # Rows fetched per round trip by item exports
+    ITEM_EXPORT_BATCH_SIZE: int = 1000
+    # Select only the output columns of list endpoints, without ORM entities
+    LIST_PROJECTION: bool = True
+    # Rows embedded per collection by `expand`, e.g. the first items of each
+    # user, the others are listed by their own endpoint
+    EXPAND_COLLECTION_LIMIT: int = 20
+    # Cache of item payloads and first list pages in Redis, disabled unless
+    # REDIS_URL is set. An item TTL of 0 disables it entirely, a list TTL of 0
+    # only the cache of lists. The size bounds the in-memory backend of tests.
+    ITEM_CACHE_TTL_SECONDS: float = 60
+    ITEM_LIST_CACHE_TTL_SECONDS: float = 10
+    ITEM_CACHE_SIZE: int = 10_000
+    # Time to wait for another request to fill a missing entry
+    ITEM_CACHE_FILL_WAIT_SECONDS: float = 0.5
+    # Time to wait for an identical read in flight before making it as well
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = 2
 
     BACKEND_CORS_ORIGINS: list[AnyHttpUrl] = []
     ALLOWED_HOSTS: list[str] = []
@@ -44,12 +87,32 @@ class Settings(BaseSettings):
 
     CELERY_BROKER_URL: str = ""
     CELERY_RESULT_BACKEND: str = ""
+    REDIS_URL: str = ""
 
     # PROJECT NAME, VERSION AND DESCRIPTION
     PROJECT_NAME: str = PYPROJECT_CONTENT["name"]
     VERSION: str = PYPROJECT_CONTENT["version"]
     DESCRIPTION: str = PYPROJECT_CONTENT["description"]
 
+    # Connection pool of the application engine. Connections beyond the size
+    # are closed when returned, requests wait up to the timeout for one.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    # Connections are replaced after this age, and checked before use
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Open DB_POOL_SIZE connections at startup
+    DB_POOL_WARM_UP: bool = True
+    # Admission of requests to the pool, see `app.db.admission`. Requests wait
+    # for less than the pool timeout, heavy ones leave some sessions to others.
+    ADMISSION_MAX_QUEUE: int = 100
+    ADMISSION_MAX_WAIT_SECONDS: float = 5
+    ADMISSION_RESERVED_SESSIONS: int = 2
+    # Heavy requests are shed while the queue delay stays above the target
+    ADMISSION_TARGET_DELAY_SECONDS: float = 0.1
+    ADMISSION_INTERVAL_SECONDS: float = 1
+
     # POSTGRESQL DEFAULT DATABASE
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
@@ -93,6 +156,14 @@ class Settings(BaseSettings):
             and info.data["EMAILS_FROM_EMAIL"]
         )
 
+    @model_validator(mode="after")
+    def check_access_token_claims(self) -> "Settings":
+        # Revocations kept in a worker would not reach the others
+        if self.ACCESS_TOKEN_CLAIMS and not self.REDIS_URL:
+            msg = "ACCESS_TOKEN_CLAIMS requires REDIS_URL"
+            raise ValueError(msg)
+        return self
+
     model_config = SettingsConfigDict(
         env_file=f"{PROJECT_DIR}/.env", case_sensitive=True
     )
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from collections.abc import Callable
+
+from redis.exceptions import RedisError
+
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationChannel:
+    def __init__(self, name: str):
+        """Broadcast invalidated keys to every worker process.
+
+        Keys are handled locally right away and published on a Redis channel
+        so that the other workers, which run `listen`, handle them as well.
+        Without Redis the invalidation stays local to the process.
+        """
+        self.name = name
+        self._handlers: list[Callable[[str], None]] = []
+        self._resync_handlers: list[Callable[[], None]] = []
+
+    def subscribe(
+        self,
+        handler: Callable[[str], None],
+        resync: Callable[[], None] | None = None,
+    ) -> None:
+        """Register a handler called with each invalidated key.
+
+        `resync` is called when messages may have been missed, e.g. after the
+        connection to Redis dropped.
+        """
+        self._handlers.append(handler)
+        if resync:
+            self._resync_handlers.append(resync)
+
+    def _handle(self, key: str) -> None:
+        for handler in self._handlers:
+            handler(key)
+
+    def _resync(self) -> None:
+        for resync in self._resync_handlers:
+            resync()
+
+    async def publish(self, key: str) -> None:
+        self._handle(key)
+        if redis_client is None:
+            return
+        try:
+            await redis_client.publish(self.name, key)
+        except RedisError:
+            logger.exception("Failed to publish invalidation of %s", key)
+
+    async def listen(self, retry_seconds: float = 1) -> None:
+        """Handle the keys published by other workers until cancelled."""
+        if redis_client is None:
+            return
+        while True:
+            try:
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.name)
+                    self._resync()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._handle(message["data"].decode())
+            except RedisError:
+                logger.exception("Lost subscription to %s, retrying", self.name)
+                await asyncio.sleep(retry_seconds)
@@ -0,0 +1,9 @@
+from redis.asyncio import Redis
+
+from app.core.config import settings
+
+# Shared client for the Redis we already run for Celery. Unset in tests, where
+# the modules relying on it fall back to in-process state.
+redis_client: Redis | None = (
+    Redis.from_url(settings.REDIS_URL) if settings.REDIS_URL else None
+)
@@ -1,6 +1,16 @@
+import asyncio
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+
 from passlib.context import CryptContext
 
+from app.api.utils import password_hasher_busy_exception
 from app.core.config import settings
+from app.models.internal import PasswordHasherStats
 
 PWD_CONTEXT = CryptContext(
     schemes=["bcrypt"],
@@ -25,3 +35,91 @@ def get_password_hash(password: str) -> str:
     It takes about 0.3s for default 12 rounds of SECURITY_BCRYPT_DEFAULT_ROUNDS.
     """
     return PWD_CONTEXT.hash(password)
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        executor: str = "thread",
+        max_workers: int = 4,
+        max_pending: int = 64,
+    ):
+        """Run bcrypt in a bounded worker pool instead of on the event loop.
+
+        **Parameters**
+
+        * `executor`: `thread` or `process` pool
+        * `max_workers`: number of hashes computed concurrently
+        * `max_pending`: number of hashes running or queued before new ones
+          are rejected with a 503
+        """
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool: Executor | None = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            pool_class = (
+                ProcessPoolExecutor
+                if self.executor == "process"
+                else ThreadPoolExecutor
+            )
+            self._pool = pool_class(max_workers=self.max_workers)
+        return self._pool
+
+    async def _run(self, func, *args):
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            raise password_hasher_busy_exception
+        loop = asyncio.get_running_loop()
+        future = self._get_pool().submit(func, *args)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        # The job is only counted out once the pool is done with it. A request
+        # cancelled meanwhile, e.g. by a disconnect, cancels the job if still
+        # queued but not once running.
+        future.add_done_callback(
+            lambda future: loop.is_closed()
+            or loop.call_soon_threadsafe(self._done, future)
+        )
+        return await asyncio.wrap_future(future)
+
+    def _done(self, future: Future) -> None:
+        self.in_flight -= 1
+        if not future.cancelled() and future.exception() is None:
+            self.completed += 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def stats(self) -> PasswordHasherStats:
+        return PasswordHasherStats(
+            executor=self.executor,
+            max_workers=self.max_workers,
+            max_pending=self.max_pending,
+            in_flight=self.in_flight,
+            queue_depth=max(0, self.in_flight - self.max_workers),
+            peak_in_flight=self.peak_in_flight,
+            completed=self.completed,
+            rejected=self.rejected,
+        )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASHER_EXECUTOR,
+    max_workers=settings.PASSWORD_HASHER_WORKERS,
+    max_pending=settings.PASSWORD_HASHER_MAX_PENDING,
+)
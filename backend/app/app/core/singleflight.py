@@ -0,0 +1,112 @@
+import asyncio
+import functools
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, ParamSpec, TypeVar
+
+from app.core.config import settings
+from app.models.internal import SingleFlightStats
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):  # noqa: N818
+    pass
+
+
+class SingleFlight:
+    def __init__(self, timeout: float):
+        """Collapse identical concurrent calls into one, within the process.
+
+        The first call for a key runs, the calls made for the same key until it
+        returns wait for its result or exception instead of running.
+
+        **Parameters**
+
+        * `timeout`: time a waiting call waits for the running one, in seconds,
+          before running itself
+        """
+        self.timeout = timeout
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of `fn`, or of the running call for `key`."""
+        self.calls += 1
+        future = self._calls.get(key)
+        if future is None:
+            return await self._lead(key, fn)
+        try:
+            # Shielded, so that a cancelled waiter leaves the call running
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            self.executions += 1
+            return await fn()
+        except _LeaderCancelled:
+            # The call was cancelled with the request that made it, the next
+            # waiter to get here makes it again
+            self.calls -= 1
+            return await self.do(key, fn)
+        self.coalesced += 1
+        return result
+
+    async def _lead(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = asyncio.get_running_loop().create_future()
+        # Without waiters, nobody retrieves the exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        self.executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self) -> SingleFlightStats:
+        return SingleFlightStats(
+            in_flight=len(self._calls),
+            calls=self.calls,
+            executions=self.executions,
+            coalesced=self.coalesced,
+            timeouts=self.timeouts,
+        )
+
+
+single_flight = SingleFlight(settings.SINGLE_FLIGHT_TIMEOUT_SECONDS)
+
+
+def coalesce(
+    key: Callable[..., Hashable],
+) -> Callable[[Callable[P, Awaitable[T]]], Callable[P, Awaitable[T]]]:
+    """Decorate a read to share its result among identical concurrent calls.
+
+    `key` is called with the arguments of the read and returns what makes
+    calls identical, e.g. an ID but not the session. The result is shared as
+    is, so it must not be an ORM entity bound to the session of one request.
+    Dependencies can be decorated as well, FastAPI sees their signature.
+    """
+
+    def decorator(fn: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            return await single_flight.do(
+                (fn.__qualname__, key(*args, **kwargs)),
+                functools.partial(fn, *args, **kwargs),
+            )
+
+        return wrapper
+
+    return decorator
@@ -1,13 +1,22 @@
 import datetime
+import hashlib
 from enum import Enum
+from typing import Any
 
 from jose import JWTError, jwt
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.models.auth import JWTTokenPayload, TokensResponse
+from app.models.user import User
 
 JWT_ALGORITHM = "HS256"
 
+# Verified token payloads keyed by token digest
+token_cache = TTLCache(
+    settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKEN_EXPIRE_HOURS * 3600
+)
+
 
 class TokenType(Enum):
     ACCESS = "access"
@@ -16,18 +25,36 @@ class TokenType(Enum):
     PASSWORD_RESET = "password-reset"
 
 
-def generate_tokens_response(subject: str | int) -> TokensResponse:
+def generate_tokens_response(
+    subject: str | int, claims: dict[str, Any] | None = None
+) -> TokensResponse:
     """Generate tokens and return AccessTokenResponse."""
     access_token = create_token(
-        subject, settings.ACCESS_TOKEN_EXPIRE_HOURS, TokenType.ACCESS
+        subject, settings.ACCESS_TOKEN_EXPIRE_HOURS, TokenType.ACCESS, claims
     )
     refresh_token = create_token(
-        subject, settings.REFRESH_TOKEN_EXPIRE_HOURS, TokenType.REFRESH
+        subject, settings.REFRESH_TOKEN_EXPIRE_HOURS, TokenType.REFRESH, claims
     )
     return TokensResponse(access_token=access_token, refresh_token=refresh_token)
 
 
-def create_token(sub: str | int, exp_hours: float, type: TokenType) -> str:
+def user_claims(user: User) -> dict[str, Any]:
+    """Return the user flags to embed in tokens if ACCESS_TOKEN_CLAIMS is enabled."""
+    if not settings.ACCESS_TOKEN_CLAIMS:
+        return {}
+    return {
+        "is_active": user.is_active,
+        "is_superuser": user.is_superuser,
+        "ver": user.token_version,
+    }
+
+
+def create_token(
+    sub: str | int,
+    exp_hours: float,
+    type: TokenType,
+    claims: dict[str, Any] | None = None,
+) -> str:
     """Create jwt access or refresh token for user.
 
     Args:
@@ -35,26 +62,44 @@ def create_token(sub: str | int, exp_hours: float, type: TokenType) -> str:
         sub: anything unique to user, id or email etc. Need to be converted to a string.
         exp_hours: expire time in hours.
         type: token type.
+        claims: extra claims, see `user_claims`.
     """
     now = datetime.datetime.now(tz=datetime.UTC)
     exp = now + datetime.timedelta(hours=exp_hours)
 
-    claims = {**JWTTokenPayload(sub=str(sub), exp=exp, nbf=now, type=type).model_dump()}
-    return jwt.encode(claims, settings.SECRET_KEY, JWT_ALGORITHM)
+    payload = JWTTokenPayload(sub=str(sub), exp=exp, nbf=now, type=type, **claims or {})
+    return jwt.encode(
+        payload.model_dump(exclude_none=True), settings.SECRET_KEY, JWT_ALGORITHM
+    )
 
 
-def decode_token(token: str, type: TokenType) -> str:
-    """Decode JWT token and return the subject."""
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM])
-    except JWTError:
-        return None
+def decode_token_payload(token: str, type: TokenType) -> JWTTokenPayload | None:
+    """Decode JWT token and return its payload.
+
+    The payload of a valid token is cached until the token expires, so clients
+    sending the same token again skip the signature verification.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    if (token_data := token_cache.get(digest)) is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        except JWTError:
+            return None
+        token_data = JWTTokenPayload(**payload)
+        now = datetime.datetime.now(tz=datetime.UTC)
+        token_cache.set(digest, token_data, (token_data.exp - now).total_seconds())
 
-    token_data = JWTTokenPayload(**payload)
     if type.value != token_data.type:
         return None
 
-    return token_data.sub
+    return token_data
+
+
+def decode_token(token: str, type: TokenType) -> str:
+    """Decode JWT token and return the subject."""
+    if token_data := decode_token_payload(token, type):
+        return token_data.sub
+    return None
 
 
 def generate_registration_validation_token(email: str) -> str:
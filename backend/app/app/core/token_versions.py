@@ -0,0 +1,38 @@
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.redis import redis_client
+
+
+class TokenVersionStore:
+    def __init__(self, prefix: str = "token-version"):
+        """Latest token version of every user whose tokens were revoked.
+
+        Access tokens carrying a `ver` claim below the stored version are
+        rejected, without loading the user from the database. Versions are
+        kept in Redis so that every worker sees them, in memory in tests only
+        as `Settings` require Redis with ACCESS_TOKEN_CLAIMS.
+        """
+        self.prefix = prefix
+        self._local: dict[str, int] = {}
+
+    def _key(self, user_id: UUID | str) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    async def get(self, user_id: UUID | str) -> int:
+        if redis_client is None:
+            return self._local.get(self._key(user_id), 0)
+        version = await redis_client.get(self._key(user_id))
+        return int(version) if version else 0
+
+    async def set(self, user_id: UUID | str, version: int) -> None:
+        if redis_client is None:
+            self._local[self._key(user_id)] = version
+            return
+        # Older tokens are expired after the refresh token lifetime anyway
+        await redis_client.set(
+            self._key(user_id), version, ex=settings.REFRESH_TOKEN_EXPIRE_HOURS * 3600
+        )
+
+
+token_versions = TokenVersionStore()
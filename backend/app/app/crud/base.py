@@ -1,10 +1,20 @@
+from collections import defaultdict
+from collections.abc import Sequence
 from typing import Any, Generic, TypeVar
 from uuid import UUID
 
-from fastapi import Query
+from pydantic import BaseModel
+from sqlalchemy import insert, true, tuple_, update
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql import ColumnElement, Select
 from sqlmodel import SQLModel, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.config import settings
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.models.page import Page
+
 ModelType = TypeVar("ModelType", bound=SQLModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=SQLModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=SQLModel)
@@ -21,26 +31,177 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
-    async def list(
+    def _select(
+        self,
+        schema: type[BaseModel] | None = None,
+        *extra: str,
+        expand: Sequence[str] = (),
+    ) -> Select:
+        """Select the model, or only the columns of the fields of `schema`.
+
+        Columns come back as plain rows, without the ORM hydration of entities
+        (identity map, change tracking), for reads that are only serialized.
+        `extra` columns are added to the rows when they are not in `schema`.
+
+        The `expand` relationships of entities are loaded with one more
+        SELECT ... WHERE IN per relationship, whatever the number of rows.
+        Collections are left to `_load_collections`, which bounds their size.
+        """
+        if schema is None:
+            options = [
+                selectinload(getattr(self.model, name))
+                for name in expand
+                if not getattr(self.model, name).property.uselist
+            ]
+            return select(self.model).options(*options)
+        fields = [*schema.model_fields]
+        fields += [field for field in extra if field not in fields]
+        return select(*(getattr(self.model, field) for field in fields))
+
+    async def _load_collections(
+        self, session: AsyncSession, db_objs: Sequence[ModelType], expand: Sequence[str]
+    ) -> None:
+        """Load the first `EXPAND_COLLECTION_LIMIT` rows of the `expand` collections.
+
+        The rows come in `(created_at, id)` order from a LATERAL subquery per
+        entity, one SELECT per collection whatever the number of entities, so a
+        page of entities embeds a bounded number of rows.
+        """
+        for name in expand:
+            relationship = getattr(self.model, name).property
+            if not relationship.uselist or not db_objs:
+                continue
+            target = relationship.mapper.class_
+            [(local, remote)] = relationship.local_remote_pairs
+            local_key = self.model.__mapper__.get_property_by_column(local).key
+            remote_key = relationship.mapper.get_property_by_column(remote).key
+            parents = (
+                select(local.label("key"))
+                .where(local.in_([getattr(db_obj, local_key) for db_obj in db_objs]))
+                .subquery()
+            )
+            rows = (
+                select(target)
+                .where(remote == parents.c.key)
+                .order_by(target.created_at, target.id)
+                .limit(settings.EXPAND_COLLECTION_LIMIT)
+                .lateral()
+            )
+            row_entity = aliased(target, rows)
+            query = (
+                select(row_entity)
+                .select_from(parents)
+                .join(rows, true())
+                .order_by(row_entity.created_at, row_entity.id)
+            )
+            collections = defaultdict(list)
+            for row in await session.exec(query):
+                collections[getattr(row, remote_key)].append(row)
+            for db_obj in db_objs:
+                set_committed_value(
+                    db_obj, name, collections[getattr(db_obj, local_key)]
+                )
+
+    async def list(  # noqa: PLR0913
         self,
         session: AsyncSession,
         offset: int = 0,
-        limit: int = Query(default=100, le=100),
+        limit: int = 100,
+        *whereclause: ColumnElement[bool],
+        schema: type[BaseModel] | None = None,
+        expand: Sequence[str] = (),
     ) -> list[ModelType] | None:
-        query = select(self.model).offset(offset).limit(limit)
-        result = await session.exec(query)
-        return result.all()
+        query = (
+            self._select(schema, expand=expand)
+            .where(*whereclause)
+            .order_by(self.model.created_at, self.model.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        db_objs = (await session.exec(query)).all()
+        if schema is None:
+            await self._load_collections(session, db_objs, expand)
+        return db_objs
+
+    async def page(  # noqa: PLR0913
+        self,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 100,
+        *whereclause: ColumnElement[bool],
+        schema: type[BaseModel] | None = None,
+        expand: Sequence[str] = (),
+    ) -> Page[ModelType]:
+        """Return the rows after `cursor` in `(created_at, id)` order.
 
-    async def get(self, session: AsyncSession, id: UUID) -> ModelType | None:
-        return await session.get(self.model, id)
+        Unlike `list`, the cost of a page does not depend on its position, as
+        it is a range scan of the `(created_at, id)` index.
+        """
+        sort_key = (self.model.created_at, self.model.id)
+        query = self._select(schema, "created_at", "id", expand=expand)
+        query = query.where(*whereclause)
+        if after := decode_cursor(cursor):
+            query = query.where(tuple_(*sort_key) > tuple_(*after))
+        query = query.order_by(*sort_key).limit(limit + 1)
+        items = (await session.exec(query)).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+        if schema is None:
+            await self._load_collections(session, items, expand)
+        return Page(items=items, next_cursor=next_cursor)
+
+    async def estimate_count(
+        self, session: AsyncSession, *whereclause: ColumnElement[bool]
+    ) -> int:
+        """Return the planner estimate of the number of rows matching `whereclause`.
+
+        The estimate comes from the table statistics, through EXPLAIN, so unlike
+        COUNT(*) its cost does not depend on the number of rows.
+        """
+        connection = await session.connection()
+        query = select(self.model.id).where(*whereclause)
+        compiled = query.compile(dialect=connection.dialect)
+        parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", parameters
+        )
+        return result.scalar_one()[0]["Plan"]["Plan Rows"]
+
+    async def get(
+        self,
+        session: AsyncSession,
+        id: UUID,
+        schema: type[BaseModel] | None = None,
+        expand: Sequence[str] = (),
+    ) -> ModelType | None:
+        if schema is None and not expand:
+            return await session.get(self.model, id)
+        query = self._select(schema, expand=expand).where(self.model.id == id)
+        db_obj = (await session.exec(query)).first()
+        if schema is None and db_obj is not None:
+            await self._load_collections(session, [db_obj], expand)
+        return db_obj
 
     async def create(
         self, session: AsyncSession, obj_in: CreateSchemaType
     ) -> ModelType:
         db_obj = self.model.model_validate(obj_in)
-        session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        return await self._insert(session, db_obj)
+
+    async def _insert(
+        self, session: AsyncSession, db_obj: ModelType, commit: bool = True
+    ) -> ModelType:
+        """Insert the object and commit, unless the caller has more to write.
+
+        The row comes back with INSERT ... RETURNING, so it does not need to be
+        refreshed with another query after the commit.
+        """
+        query = insert(self.model).values(db_obj.model_dump()).returning(self.model)
+        db_obj = (await session.exec(query)).scalar_one()
+        if commit:
+            await session.commit()
         return db_obj
 
     async def update(
@@ -53,11 +214,20 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             obj_data = obj_in
         else:
             obj_data = obj_in.model_dump(exclude_unset=True)
-        for key, value in obj_data.items():
-            setattr(db_obj, key, value)
-        session.add(db_obj)
+        if not obj_data:
+            return db_obj
+        # UPDATE ... RETURNING refreshes db_obj in the same statement
+        query = (
+            update(self.model)
+            .where(self.model.id == db_obj.id)
+            .values(obj_data)
+            .returning(self.model)
+        )
+        result = await session.exec(
+            query, execution_options={"populate_existing": True}
+        )
+        db_obj = result.scalar_one()
         await session.commit()
-        await session.refresh(db_obj)
         return db_obj
 
     async def delete(self, session: AsyncSession, db_obj: ModelType) -> None:
@@ -1,13 +1,52 @@
+from collections import Counter
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from typing import Any, NoReturn
 from uuid import UUID
 
-from fastapi import Query
+from pydantic import BaseModel
+from sqlalchemy import (
+    REAL,
+    Row,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    insert,
+    or_,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.sql import ColumnElement
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.utils import item_not_found_exception, no_permissions_exception
+from app.api.utils import (
+    dump_json,
+    item_modified_exception,
+    item_not_found_exception,
+    list_etag,
+    no_permissions_exception,
+)
+from app.core.singleflight import coalesce
 from app.crud.base import CRUDBase
-from app.models.item import Item, ItemCreate, ItemUpdate
-from app.models.user import User
+from app.crud.item_cache import CachedItem, CachedList, item_cache
+from app.crud.pagination import decode_rank_cursor, encode_rank_cursor
+from app.models.auth import UserClaims
+from app.models.item import (
+    SEARCH_CONFIG,
+    BulkError,
+    Item,
+    ItemBulkUpdate,
+    ItemCount,
+    ItemCreate,
+    ItemOut,
+    ItemUpdate,
+)
+from app.models.page import Page
 
 
 class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
@@ -15,36 +54,409 @@ class CRUDItem(CRUDBase[Item, ItemCreate, ItemUpdate]):
         self, session: AsyncSession, obj_in: ItemCreate, user_id: UUID
     ) -> Item:
         db_obj = Item.model_validate(obj_in.model_dump(), update={"owner_id": user_id})
-        session.add(db_obj)
+        db_obj = await self._insert(session, db_obj, commit=False)
+        await self._add_counts(session, {user_id: 1})
         await session.commit()
-        await session.refresh(db_obj)
+        await item_cache.invalidate(owner_ids=[user_id])
         return db_obj
 
-    async def list_by_owner(
+    async def bulk_create_with_owner(
+        self, session: AsyncSession, objs_in: list[ItemCreate], user_id: UUID
+    ) -> list[Item]:
+        """Insert the items with a multi-row INSERT ... RETURNING in one transaction."""
+        if not objs_in:
+            return []
+        rows = [
+            Item.model_validate(obj_in.model_dump(), update={"owner_id": user_id})
+            for obj_in in objs_in
+        ]
+        result = await session.exec(
+            insert(Item).returning(Item), params=[row.model_dump() for row in rows]
+        )
+        db_objs = {db_obj.id: db_obj for db_obj in result.scalars()}
+        await self._add_counts(session, {user_id: len(rows)})
+        await session.commit()
+        await item_cache.invalidate(owner_ids=[user_id])
+        return [db_objs[row.id] for row in rows]
+
+    async def bulk_update_by_owner(
+        self, session: AsyncSession, objs_in: list[ItemBulkUpdate], user: UserClaims
+    ) -> tuple[list[Item], list[BulkError]]:
+        """Update the items the user may update, in one transaction.
+
+        The items are locked and checked with one query, then updated with one
+        executemany per set of updated fields. Items which are missing or not
+        owned by the user are reported as errors.
+        """
+        ids = [obj_in.id for obj_in in objs_in]
+        # Locked in the same order by every transaction, so that overlapping
+        # bulk updates wait for each other instead of deadlocking
+        query = (
+            select(Item.id, Item.owner_id)
+            .where(Item.id.in_(ids))
+            .order_by(Item.id)
+            .with_for_update()
+        )
+        owners = dict((await session.exec(query)).all())
+        errors = self._ownership_errors(ids, owners, user)
+        rejected = {error.index for error in errors}
+
+        params_by_fields: dict[frozenset[str], list[dict]] = {}
+        for index, obj_in in enumerate(objs_in):
+            params = obj_in.model_dump(exclude_unset=True)
+            if index not in rejected and len(params) > 1:
+                params_by_fields.setdefault(frozenset(params), []).append(params)
+        for params in params_by_fields.values():
+            await session.exec(update(Item), params=params)
+
+        updated_ids = [
+            item_id for index, item_id in enumerate(ids) if index not in rejected
+        ]
+        query = select(Item).where(Item.id.in_(updated_ids))
+        result = await session.exec(
+            query, execution_options={"populate_existing": True}
+        )
+        db_objs = {db_obj.id: db_obj for db_obj in result}
+        await session.commit()
+        await item_cache.invalidate(
+            updated_ids, [db_obj.owner_id for db_obj in db_objs.values()]
+        )
+        return [db_objs[item_id] for item_id in updated_ids], errors
+
+    async def bulk_delete_by_owner(
+        self, session: AsyncSession, ids: list[UUID], user: UserClaims
+    ) -> tuple[list[UUID], list[BulkError]]:
+        """Delete the items the user may delete, in one transaction."""
+        whereclause = [Item.id.in_(ids)]
+        if not user.is_superuser:
+            whereclause.append(Item.owner_id == user.id)
+        query = delete(Item).where(*whereclause).returning(Item.id, Item.owner_id)
+        deleted_owners = dict((await session.exec(query)).all())
+        counts = Counter(deleted_owners.values())
+        await self._add_counts(
+            session, {owner_id: -n for owner_id, n in counts.items()}
+        )
+        await session.commit()
+        await item_cache.invalidate(deleted_owners, deleted_owners.values())
+        deleted = set(deleted_owners)
+        owners = dict.fromkeys(deleted, user.id)
+        if missing := set(ids) - deleted:
+            query = select(Item.id, Item.owner_id).where(Item.id.in_(missing))
+            owners |= dict((await session.exec(query)).all())
+        errors = self._ownership_errors(ids, owners, user)
+        rejected = {error.index for error in errors}
+        return [
+            item_id for index, item_id in enumerate(ids) if index not in rejected
+        ], errors
+
+    async def get_many_by_owner(
+        self, session: AsyncSession, ids: list[UUID], user: UserClaims
+    ) -> tuple[list[Item], list[BulkError]]:
+        """Fetch the items the user may retrieve, in the order of `ids`.
+
+        The ids are passed as a single array parameter, so the statement is the
+        same whatever their number. Owners are only looked up for the ids which
+        were not found, to report them as missing or forbidden.
+        """
+        whereclause = [Item.id == any_(bindparam("ids", ids, ARRAY(Item.id.type)))]
+        if not user.is_superuser:
+            whereclause.append(Item.owner_id == user.id)
+        query = select(Item).where(*whereclause)
+        db_objs = {db_obj.id: db_obj for db_obj in await session.exec(query)}
+        owners = dict.fromkeys(db_objs, user.id)
+        if missing := set(ids) - db_objs.keys():
+            query = select(Item.id, Item.owner_id).where(Item.id.in_(missing))
+            owners |= dict((await session.exec(query)).all())
+        errors = self._ownership_errors(ids, owners, user)
+        rejected = {error.index for error in errors}
+        found = [item_id for index, item_id in enumerate(ids) if index not in rejected]
+        return [db_objs[item_id] for item_id in found], errors
+
+    @staticmethod
+    def _ownership_errors(
+        ids: list[UUID], owners: dict[UUID, UUID], user: UserClaims
+    ) -> list[BulkError]:
+        errors = []
+        seen = set()
+        for index, item_id in enumerate(ids):
+            if item_id in seen:
+                detail = "Duplicate item"
+            elif item_id not in owners:
+                detail = item_not_found_exception.detail
+            elif not user.is_superuser and owners[item_id] != user.id:
+                detail = no_permissions_exception.detail
+            else:
+                detail = None
+            seen.add(item_id)
+            if detail:
+                errors.append(BulkError(index=index, id=item_id, detail=detail))
+        return errors
+
+    async def list_by_owner(  # noqa: PLR0913
         self,
         session: AsyncSession,
         user_id: UUID,
         offset: int = 0,
-        limit: int = Query(default=100, le=100),
+        limit: int = 100,
+        schema: type[BaseModel] | None = None,
+        expand: Sequence[str] = (),
     ) -> list[Item]:
         query = (
-            select(self.model)
+            self._select(schema, expand=expand)
             .filter(Item.owner_id == user_id)
+            .order_by(Item.created_at, Item.id)
             .offset(offset)
             .limit(limit)
         )
         result = await session.exec(query)
         return result.all()
 
-    async def get_by_owner(
-        self, session: AsyncSession, id: UUID, user: User
-    ) -> Item | None:
-        db_obj = await self.get(session, id)
+    async def page_by_owner(  # noqa: PLR0913
+        self,
+        session: AsyncSession,
+        user_id: UUID,
+        cursor: str | None = None,
+        limit: int = 100,
+        schema: type[BaseModel] | None = None,
+        expand: Sequence[str] = (),
+    ) -> Page[Item]:
+        return await self.page(
+            session,
+            cursor,
+            limit,
+            Item.owner_id == user_id,
+            schema=schema,
+            expand=expand,
+        )
+
+    async def get_cached_by_owner(
+        self, session: AsyncSession, id: UUID, user: UserClaims
+    ) -> CachedItem:
+        """Return the `ItemOut` JSON of the item if the user may, from `item_cache`."""
+        item = await self._get_cached(session, id)
+        if not user.is_superuser and item.owner_id != user.id:
+            raise no_permissions_exception
+        return item
+
+    @coalesce(lambda self, session, id: id)
+    async def _get_cached(self, session: AsyncSession, id: UUID) -> CachedItem:
+        async def load() -> CachedItem:
+            query = self._select(ItemOut).where(Item.id == id)
+            row = (await session.exec(query)).first()
+            if not row:
+                raise item_not_found_exception
+            return CachedItem(row.owner_id, row.updated_at, dump_json(ItemOut, row))
+
+        return await item_cache.get_item(id, load)
+
+    async def first_page_cached_by_owner(
+        self, session: AsyncSession, user_id: UUID, limit: int, paginated: bool
+    ) -> CachedList:
+        """Return the JSON of the first page of the user's items, from `item_cache`.
+
+        The page is that of `list_by_owner` without offset, or of `page_by_owner`
+        without cursor if `paginated`.
+        """
+
+        async def load() -> CachedList:
+            if paginated:
+                page = await self.page_by_owner(
+                    session, user_id, "", limit, schema=ItemOut
+                )
+                etag = list_etag(
+                    ((item.id, item.updated_at) for item in page.items),
+                    page.next_cursor,
+                )
+                return CachedList(etag, dump_json(Page[ItemOut], page))
+            items = await self.list_by_owner(session, user_id, 0, limit, schema=ItemOut)
+            etag = list_etag((item.id, item.updated_at) for item in items)
+            return CachedList(etag, dump_json(list[ItemOut], items))
+
+        variant = f"{'page' if paginated else 'list'}:{limit}"
+        return await item_cache.get_list(user_id, variant, load)
+
+    async def stream_visible(
+        self, session: AsyncSession, user: UserClaims, batch_size: int = 1000
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yield the `ItemOut` columns of the items visible to the user in batches.
+
+        Rows are fetched from a server-side cursor, `batch_size` at a time, so
+        memory use does not depend on the number of items.
+        """
+        query = self._select(ItemOut)
+        if not user.is_superuser:
+            query = query.where(Item.owner_id == user.id)
+        query = query.order_by(Item.created_at, Item.id)
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+    async def search(  # noqa: PLR0913
+        self,
+        session: AsyncSession,
+        user: UserClaims,
+        q: str,
+        cursor: str | None = None,
+        limit: int = 100,
+    ) -> Page[Item]:
+        """Return the items visible to the user which match `q`, best first.
+
+        The words of `q` are looked up in the full-text index of titles and
+        descriptions, and `q` in the trigram index of titles for prefixes and
+        misspellings. Pages continue after `cursor` in `(rank, id)` order.
+        """
+        search_vector = Item.__table__.c.search_vector
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank = func.ts_rank(search_vector, tsquery) + func.word_similarity(
+            q, Item.title
+        )
+        prefix = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = select(Item, rank).where(
+            or_(
+                search_vector.op("@@")(tsquery),
+                # title %> q is q <% title, the form the trigram index serves
+                Item.title.op("%>")(q),
+                Item.title.ilike(f"{prefix}%"),
+            )
+        )
+        if not user.is_superuser:
+            query = query.where(Item.owner_id == user.id)
+        if after := decode_rank_cursor(cursor):
+            after_rank, after_id = after
+            query = query.where(
+                tuple_(rank, Item.id) < tuple_(cast(after_rank, REAL), after_id)
+            )
+        query = query.order_by(rank.desc(), Item.id.desc()).limit(limit + 1)
+        rows = (await session.exec(query)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_rank_cursor(rows[-1][1], rows[-1][0].id)
+        return Page(items=[item for item, _ in rows], next_cursor=next_cursor)
+
+    async def get_by_owner(  # noqa: PLR0913
+        self,
+        session: AsyncSession,
+        id: UUID,
+        user: UserClaims,
+        schema: type[BaseModel] | None = None,
+        expand: Sequence[str] = (),
+    ) -> Item | Row:
+        if schema is None:
+            db_obj = await self.get(session, id, expand=expand)
+        else:
+            query = self._select(schema, "owner_id", "updated_at").where(Item.id == id)
+            db_obj = (await session.exec(query)).first()
         if not db_obj:
             raise item_not_found_exception
         if not user.is_superuser and db_obj.owner_id != user.id:
             raise no_permissions_exception
         return db_obj
 
+    async def update_by_owner(  # noqa: PLR0913
+        self,
+        session: AsyncSession,
+        id: UUID,
+        user: UserClaims,
+        obj_in: ItemUpdate,
+        versions: list[datetime] | None = None,
+    ) -> Item:
+        """Update the item if the user may, in a single UPDATE ... RETURNING.
+
+        With `versions`, the item is only updated if its `updated_at` is one of
+        them, otherwise `item_modified_exception` is raised.
+        """
+        obj_data = obj_in.model_dump(exclude_unset=True)
+        whereclause = self._owned_by(id, user)
+        if versions is not None:
+            whereclause.append(Item.updated_at.in_(versions))
+        if obj_data:
+            query = update(Item).where(*whereclause).values(obj_data).returning(Item)
+        else:
+            query = select(Item).where(*whereclause)
+        result = await session.exec(
+            query, execution_options={"populate_existing": True}
+        )
+        db_obj = result.scalar_one_or_none() if obj_data else result.first()
+        if not db_obj:
+            await self._raise_not_owned(session, id, user)
+        await session.commit()
+        if obj_data:
+            await item_cache.invalidate([db_obj.id], [db_obj.owner_id])
+        return db_obj
+
+    async def delete_by_owner(
+        self, session: AsyncSession, id: UUID, user: UserClaims
+    ) -> None:
+        """Delete the item if the user may, in a single DELETE ... RETURNING."""
+        query = delete(Item).where(*self._owned_by(id, user)).returning(Item.owner_id)
+        row = (await session.exec(query)).first()
+        if not row:
+            await self._raise_not_owned(session, id, user)
+        await self._add_counts(session, {row.owner_id: -1})
+        await session.commit()
+        await item_cache.invalidate([id], [row.owner_id])
+
+    async def update(
+        self,
+        session: AsyncSession,
+        db_obj: Item,
+        obj_in: ItemUpdate | dict[str, Any],
+    ) -> Item:
+        db_obj = await super().update(session, db_obj, obj_in)
+        await item_cache.invalidate([db_obj.id], [db_obj.owner_id])
+        return db_obj
+
+    async def delete(self, session: AsyncSession, db_obj: Item) -> None:
+        item_id, owner_id = db_obj.id, db_obj.owner_id
+        await self._add_counts(session, {owner_id: -1})
+        await super().delete(session, db_obj)
+        await item_cache.invalidate([item_id], [owner_id])
+
+    @staticmethod
+    async def _add_counts(session: AsyncSession, counts: dict[UUID, int]) -> None:
+        """Add to the item counts of the owners, in the transaction of the write.
+
+        Owners are updated in a fixed order, so that concurrent writes for the
+        same owners cannot deadlock.
+        """
+        counts = {owner_id: n for owner_id, n in counts.items() if owner_id and n}
+        if not counts:
+            return
+        query = pg_insert(ItemCount).values(
+            [
+                {"owner_id": owner_id, "count": n}
+                for owner_id, n in sorted(counts.items())
+            ]
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[ItemCount.owner_id],
+            set_={"count": ItemCount.count + query.excluded["count"]},
+        )
+        await session.exec(query)
+
+    async def count_by_owner(self, session: AsyncSession, user_id: UUID) -> int:
+        """Return the number of items of the user, from their counter."""
+        query = select(ItemCount.count).where(ItemCount.owner_id == user_id)
+        return (await session.exec(query)).first() or 0
+
+    @staticmethod
+    def _owned_by(id: UUID, user: UserClaims) -> list[ColumnElement[bool]]:
+        whereclause = [Item.id == id]
+        if not user.is_superuser:
+            whereclause.append(Item.owner_id == user.id)
+        return whereclause
+
+    async def _raise_not_owned(
+        self, session: AsyncSession, id: UUID, user: UserClaims
+    ) -> NoReturn:
+        """Tell why a write matched no item: missing, not owned or modified."""
+        query = select(Item.owner_id).where(Item.id == id)
+        if (owner_id := (await session.exec(query)).first()) is None:
+            raise item_not_found_exception
+        if not user.is_superuser and owner_id != user.id:
+            raise no_permissions_exception
+        raise item_modified_exception
+
 
 crud_item = CRUDItem(Item)
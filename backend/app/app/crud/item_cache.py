@@ -0,0 +1,305 @@
+"""Read-through cache of serialized items and first pages of item lists.
+
+Entries are tagged with a generation: the item's own for `GET /items/{id}`,
+the owner's for their first list pages. Writes bump the generations of the
+items and owners they touch after committing, which invalidates any number of
+entries at once. An entry filled by a read which raced with a write is tagged
+with the old generation and never served.
+
+Only one reader per key loads a missing entry from the database, the others
+wait for it to be filled for a bounded time, so that an invalidated hot key
+does not send every concurrent request to Postgres.
+"""
+
+import asyncio
+import logging
+import secrets
+import time
+from collections.abc import Awaitable, Callable, Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import NamedTuple, Protocol
+from uuid import UUID
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.api.utils import EPOCH
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.models.internal import ItemCacheStats
+
+logger = logging.getLogger(__name__)
+
+# Generations outlive the entries tagged with them unless evicted first. A lost
+# generation is reseeded at random, by reads and writes alike, so that it does
+# not match the entries of the old one
+GENERATION_TTL_SECONDS = 24 * 3600
+FILL_POLL_SECONDS = 0.01
+
+
+class CachedItem(NamedTuple):
+    owner_id: UUID
+    updated_at: datetime
+    content: bytes
+
+
+class CachedList(NamedTuple):
+    etag: str
+    content: bytes
+
+
+class CacheBackend(Protocol):
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set the key unless it exists, return whether it was set."""
+
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def incr(self, key: str, initial: int, ttl: float) -> int:
+        """Increment the key, from `initial` if it is missing."""
+
+
+class RedisCacheBackend:
+    def __init__(self, client: Redis):
+        self.client = client
+
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        return await self.client.mget(keys)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(await self.client.set(key, value, px=int(ttl * 1000), nx=True))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+    async def incr(self, key: str, initial: int, ttl: float) -> int:
+        # A transaction, so that no reader sees the key unset or at `initial`
+        async with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.set(key, initial, nx=True)
+            pipeline.incr(key)
+            pipeline.pexpire(key, int(ttl * 1000))
+            _, value, _ = await pipeline.execute()
+        return value
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int):
+        """In-process backend, for tests and single process deployments."""
+        self._data = TTLCache(maxsize, ttl=0)
+
+    async def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        return [self._data.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._data.set(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if self._data.get(key) is not None:
+            return False
+        self._data.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key)
+
+    async def incr(self, key: str, initial: int, ttl: float) -> int:
+        value = int(self._data.get(key) or initial) + 1
+        self._data.set(key, str(value).encode(), ttl)
+        return value
+
+
+class ItemCache:
+    def __init__(  # noqa: PLR0913
+        self,
+        backend: CacheBackend,
+        ttl: float,
+        list_ttl: float,
+        fill_wait: float,
+        prefix: str = "item-cache",
+    ):
+        """Cache of item payloads over a Redis or in-memory backend.
+
+        **Parameters**
+
+        * `ttl`: time to live of the items in seconds, 0 disables the cache
+        * `list_ttl`: time to live of the list pages in seconds, 0 disables
+          the cache of lists only
+        * `fill_wait`: time to wait for another reader to fill a missing entry
+          before loading it as well, in seconds
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.list_ttl = list_ttl
+        self.fill_wait = fill_wait
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.waits = 0
+        self.wait_timeouts = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _generation_key(self, kind: str, id: UUID) -> str:
+        return f"{self.prefix}:gen:{kind}:{id}"
+
+    async def get_item(
+        self, id: UUID, load: Callable[[], Awaitable[CachedItem]]
+    ) -> CachedItem:
+        """Return the payload of the item with its owner, loaded on a miss."""
+
+        async def load_entry() -> bytes:
+            item = await load()
+            version = (item.updated_at - EPOCH) // timedelta(microseconds=1)
+            return item.owner_id.bytes + version.to_bytes(8, signed=True) + item.content
+
+        entry = await self._read_through(
+            f"{self.prefix}:item:{id}",
+            self._generation_key("item", id),
+            load_entry,
+            self.ttl,
+        )
+        version = int.from_bytes(entry[16:24], signed=True)
+        return CachedItem(
+            owner_id=UUID(bytes=entry[:16]),
+            updated_at=EPOCH + timedelta(microseconds=version),
+            content=entry[24:],
+        )
+
+    async def get_list(
+        self, owner_id: UUID, variant: str, load: Callable[[], Awaitable[CachedList]]
+    ) -> CachedList:
+        """Return a list page of the owner's items with its ETag, loaded on a miss.
+
+        `variant` tells apart the pages of different shapes, e.g. limits.
+        """
+
+        async def load_entry() -> bytes:
+            page = await load()
+            return page.etag.encode() + b"\n" + page.content
+
+        entry = await self._read_through(
+            f"{self.prefix}:list:{owner_id}:{variant}",
+            self._generation_key("owner", owner_id),
+            load_entry,
+            self.list_ttl,
+        )
+        etag, _, content = entry.partition(b"\n")
+        return CachedList(etag=etag.decode(), content=content)
+
+    async def invalidate(
+        self, item_ids: Iterable[UUID] = (), owner_ids: Iterable[UUID] = ()
+    ) -> None:
+        """Bump the generations of the items and the owners, after a write."""
+        keys = [self._generation_key("item", item_id) for item_id in set(item_ids)]
+        keys += [self._generation_key("owner", owner_id) for owner_id in set(owner_ids)]
+        if self.ttl <= 0 or not keys:
+            return
+        try:
+            for key in keys:
+                # A lost generation is reseeded, not restarted from 0, so that
+                # entries tagged with an old generation never match again
+                await self.backend.incr(
+                    key, secrets.randbits(62), GENERATION_TTL_SECONDS
+                )
+        except RedisError:
+            # Entries are left to expire
+            self.errors += 1
+            logger.exception("Failed to invalidate %s", keys)
+            return
+        self.invalidations += len(keys)
+
+    async def _read_through(
+        self,
+        key: str,
+        generation_key: str,
+        load: Callable[[], Awaitable[bytes]],
+        ttl: float,
+    ) -> bytes:
+        if self.ttl <= 0 or ttl <= 0:
+            return await load()
+        try:
+            generation, value = await self._lookup(key, generation_key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            if not await self.backend.add(f"{key}:fill", b"1", self.fill_wait):
+                # Another reader is loading the entry
+                deadline = time.monotonic() + self.fill_wait
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(FILL_POLL_SECONDS)
+                    _, value = await self._lookup(key, generation_key)
+                    if value is not None:
+                        self.waits += 1
+                        return value
+                self.wait_timeouts += 1
+                return await load()
+        except RedisError:
+            self.errors += 1
+            logger.exception("Failed to read %s from the cache", key)
+            return await load()
+        try:
+            value = await load()
+            await self.backend.set(key, generation + b":" + value, ttl)
+            self.fills += 1
+        except RedisError:
+            self.errors += 1
+            logger.exception("Failed to fill %s in the cache", key)
+        finally:
+            try:
+                await self.backend.delete(f"{key}:fill")
+            except RedisError:
+                logger.exception("Failed to release the fill of %s", key)
+        return value
+
+    async def _lookup(
+        self, key: str, generation_key: str
+    ) -> tuple[bytes, bytes | None]:
+        """Return the current generation and the entry if tagged with it."""
+        generation, entry = await self.backend.get_many([generation_key, key])
+        if generation is None:
+            generation = str(secrets.randbits(62)).encode()
+            if not await self.backend.add(
+                generation_key, generation, GENERATION_TTL_SECONDS
+            ):
+                [generation] = await self.backend.get_many([generation_key])
+            return generation or b"", None
+        tag, _, value = (entry or b"").partition(b":")
+        if entry is None or tag != generation:
+            return generation, None
+        return generation, value
+
+    def stats(self) -> ItemCacheStats:
+        return ItemCacheStats(
+            backend=type(self.backend).__name__,
+            hits=self.hits,
+            misses=self.misses,
+            fills=self.fills,
+            waits=self.waits,
+            wait_timeouts=self.wait_timeouts,
+            invalidations=self.invalidations,
+            errors=self.errors,
+        )
+
+
+# Without Redis, writes would only invalidate the entries of their own worker
+# process, which would serve stale items to the others, so the cache is off
+item_cache = ItemCache(
+    RedisCacheBackend(redis_client)
+    if redis_client is not None
+    else MemoryCacheBackend(settings.ITEM_CACHE_SIZE),
+    ttl=settings.ITEM_CACHE_TTL_SECONDS if redis_client is not None else 0,
+    list_ttl=settings.ITEM_LIST_CACHE_TTL_SECONDS,
+    fill_wait=settings.ITEM_CACHE_FILL_WAIT_SECONDS,
+)
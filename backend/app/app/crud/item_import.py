@@ -0,0 +1,284 @@
+"""Bulk import of items through COPY into the `item_import` staging table.
+
+Uploads are parsed and validated while they are received, copied to the
+staging table in batches with asyncpg `copy_records_to_table` and then merged
+into `item` with a single INSERT ... SELECT. The upload is never held in
+memory as a whole.
+
+Each batch is committed as it is copied, so that a slow upload holds neither
+a transaction open nor row locks, and only the merge is a transaction. Imports
+are recorded in `item_import_job` first: background jobs with their owner, to
+read their status, and any job with its staged rows until they are merged,
+deleted after a failure or expired.
+"""
+
+import asyncio
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Literal
+from uuid import UUID
+
+from celery import shared_task
+from pydantic import ValidationError
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.crud.item_cache import ItemCache, RedisCacheBackend, item_cache
+from app.db.session import engine
+from app.models.item import BulkError, ItemCreate
+from app.models.item_import import ItemImportJob
+
+STAGING_COLUMNS = ("id", "job_id", "title", "description", "created_at")
+
+MERGE_QUERY = """
+INSERT INTO item (id, title, description, owner_id, created_at, updated_at)
+SELECT id, title, description, $2, created_at, created_at
+FROM item_import WHERE job_id = $1
+"""
+CLEAN_QUERY = "DELETE FROM item_import WHERE job_id = $1"
+JOB_QUERY = "INSERT INTO item_import_job (id, owner_id, created_at) VALUES ($1, $2, $3)"
+DELETE_JOB_QUERY = "DELETE FROM item_import_job WHERE id = $1"
+# Staged rows of jobs whose task never ran or whose cleanup failed
+EXPIRE_QUERIES = (
+    "DELETE FROM item_import USING item_import_job "
+    "WHERE item_import.job_id = item_import_job.id "
+    "AND item_import_job.created_at < $1",
+    "DELETE FROM item_import_job WHERE created_at < $1",
+)
+# As CRUDItem._add_counts
+COUNT_QUERY = """
+INSERT INTO item_count (owner_id, count) VALUES ($1, $2)
+ON CONFLICT (owner_id) DO UPDATE SET count = item_count.count + excluded.count
+"""
+
+
+async def _aenumerate(
+    iterable: AsyncIterator[Any],
+) -> AsyncIterator[tuple[int, Any]]:
+    index = 0
+    async for value in iterable:
+        yield index, value
+        index += 1
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def _ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    async for line in _lines(chunks):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+
+
+async def _csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    header = None
+    record = ""
+    async for line in _lines(chunks):
+        record += line
+        # A quoted field may span several lines
+        if record.count('"') % 2:
+            record += "\n"
+            continue
+        values, record = next(csv.reader([record]), []), ""
+        if not values:
+            continue
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield ValueError(f"Expected {len(header)} fields, got {len(values)}")
+            continue
+        yield {key: value or None for key, value in zip(header, values, strict=True)}
+
+
+def _error_detail(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors()
+        )
+    return str(error)
+
+
+async def stage_items(
+    connection: AsyncConnection,
+    job_id: UUID,
+    chunks: AsyncIterator[bytes],
+    format: Literal["ndjson", "csv"],
+) -> tuple[int, list[BulkError]]:
+    """Validate the uploaded rows and COPY the valid ones to the staging table.
+
+    Return the number of staged rows and the first errors, whose index is the
+    position of the row in the upload.
+    """
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    rows = _csv_rows(chunks) if format == "csv" else _ndjson_rows(chunks)
+    staged, errors, batch = 0, [], []
+    async for index, row in _aenumerate(rows):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            item = ItemCreate.model_validate(row)
+        except (ValueError, TypeError) as e:
+            if len(errors) < settings.ITEM_IMPORT_MAX_ERRORS:
+                errors.append(BulkError(index=index, detail=_error_detail(e)))
+            continue
+        # Naive UTC timestamps, as set by BaseUUIDModel
+        created_at = datetime.utcnow()  # noqa: DTZ003
+        batch.append((uuid7(), job_id, item.title, item.description, created_at))
+        if len(batch) >= settings.ITEM_IMPORT_BATCH_SIZE:
+            staged += await _copy(driver_connection, batch)
+            batch = []
+    if batch:
+        staged += await _copy(driver_connection, batch)
+    return staged, errors
+
+
+async def _copy(driver_connection, batch: list[tuple]) -> int:
+    await driver_connection.copy_records_to_table(
+        "item_import", records=batch, columns=STAGING_COLUMNS
+    )
+    return len(batch)
+
+
+async def merge_items(connection: AsyncConnection, job_id: UUID, user_id: UUID) -> int:
+    """Move the staged rows of the job into `item`, owned by the user."""
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    status = await driver_connection.execute(MERGE_QUERY, job_id, user_id)
+    await driver_connection.execute(CLEAN_QUERY, job_id)
+    # The status is "INSERT 0 <count>"
+    imported = int(status.split()[-1])
+    if imported:
+        await driver_connection.execute(COUNT_QUERY, user_id, imported)
+    return imported
+
+
+@asynccontextmanager
+async def _connection(session: AsyncSession) -> AsyncIterator[AsyncConnection]:
+    """Yield a connection for an import, within the admission of the request.
+
+    The transaction of the session, e.g. of the user lookup, is committed
+    first, which returns its connection to the pool for the import to take.
+    Statements go through the asyncpg connection, outside of any transaction
+    unless one is opened on it: SQLAlchemy only begins its own on the first
+    statement executed through it, none is.
+    """
+    await session.commit()
+    async with engine.connect() as connection:
+        yield connection
+
+
+async def _start_job(driver_connection, job_id: UUID, user_id: UUID) -> None:
+    """Record the job and delete the expired ones."""
+    # Naive UTC timestamps, as set by BaseUUIDModel
+    now = datetime.utcnow()  # noqa: DTZ003
+    expired = now - timedelta(seconds=settings.ITEM_IMPORT_JOB_EXPIRE_SECONDS)
+    for query in EXPIRE_QUERIES:
+        await driver_connection.execute(query, expired)
+    await driver_connection.execute(JOB_QUERY, job_id, user_id, now)
+
+
+async def import_items(
+    session: AsyncSession,
+    job_id: UUID,
+    user_id: UUID,
+    chunks: AsyncIterator[bytes],
+    format: Literal["ndjson", "csv"],
+) -> tuple[int, int, list[BulkError]]:
+    """Stage an upload batch by batch, then merge it in one transaction."""
+    async with _connection(session) as connection:
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        await _start_job(driver_connection, job_id, user_id)
+        try:
+            staged, errors = await stage_items(connection, job_id, chunks, format)
+            async with driver_connection.transaction():
+                imported = await merge_items(connection, job_id, user_id)
+                await driver_connection.execute(DELETE_JOB_QUERY, job_id)
+        except Exception:
+            # E.g. the client disconnected, the expiry of the job is the
+            # fallback if this fails as well
+            await driver_connection.execute(CLEAN_QUERY, job_id)
+            await driver_connection.execute(DELETE_JOB_QUERY, job_id)
+            raise
+    if imported:
+        await item_cache.invalidate(owner_ids=[user_id])
+    return staged, imported, errors
+
+
+async def stage_items_for_task(
+    session: AsyncSession,
+    job_id: UUID,
+    user_id: UUID,
+    chunks: AsyncIterator[bytes],
+    format: Literal["ndjson", "csv"],
+) -> tuple[int, list[BulkError]]:
+    """Record the job and stage an upload, to be merged by `merge_item_import`."""
+    async with _connection(session) as connection:
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        await _start_job(driver_connection, job_id, user_id)
+        try:
+            return await stage_items(connection, job_id, chunks, format)
+        except Exception:
+            await driver_connection.execute(CLEAN_QUERY, job_id)
+            raise
+
+
+async def get_job(session: AsyncSession, job_id: UUID) -> ItemImportJob | None:
+    return await session.get(ItemImportJob, job_id)
+
+
+async def _merge_job(job_id: UUID, user_id: UUID) -> int:
+    # Celery runs each task in a new event loop, which neither the pooled
+    # connections of the application engine nor the Redis client of
+    # `item_cache` can be shared with
+    task_engine = create_async_engine(settings.ASYNC_DATABASE_URI, poolclass=NullPool)
+    try:
+        try:
+            async with task_engine.connect() as connection:
+                raw_connection = await connection.get_raw_connection()
+                async with raw_connection.driver_connection.transaction():
+                    imported = await merge_items(connection, job_id, user_id)
+        except Exception:
+            # The task is not retried, e.g. the owner was deleted meanwhile
+            async with task_engine.connect() as connection:
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.execute(CLEAN_QUERY, job_id)
+            raise
+    finally:
+        await task_engine.dispose()
+    # Without Redis, the item cache is disabled
+    if imported and settings.REDIS_URL:
+        async with Redis.from_url(settings.REDIS_URL) as client:
+            task_cache = ItemCache(
+                RedisCacheBackend(client),
+                ttl=item_cache.ttl,
+                list_ttl=item_cache.list_ttl,
+                fill_wait=item_cache.fill_wait,
+            )
+            await task_cache.invalidate(owner_ids=[user_id])
+    return imported
+
+
+@shared_task
+def merge_item_import(job_id: str, user_id: str) -> int:
+    return asyncio.run(_merge_job(UUID(job_id), UUID(user_id)))
@@ -0,0 +1,53 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from app.api.utils import invalid_cursor_exception
+
+
+def _encode(values: list[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode(cursor: str) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor))
+    except ValueError as e:
+        raise invalid_cursor_exception from e
+    if not isinstance(values, list):
+        raise invalid_cursor_exception
+    return values
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor."""
+    return _encode([created_at.isoformat(), str(id)])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID] | None:
+    """Decode a cursor from `encode_cursor`. An empty cursor is the first page."""
+    if not cursor:
+        return None
+    try:
+        created_at, row_id = _decode(cursor)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (ValueError, TypeError) as e:
+        raise invalid_cursor_exception from e
+
+
+def encode_rank_cursor(rank: float, id: UUID) -> str:
+    """Encode the relevance and id of the last row of a page of search results."""
+    return _encode([rank, str(id)])
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, UUID] | None:
+    """Decode a cursor from `encode_rank_cursor`, as for `decode_cursor`."""
+    if not cursor:
+        return None
+    try:
+        rank, row_id = _decode(cursor)
+        return float(rank), UUID(row_id)
+    except (ValueError, TypeError) as e:
+        raise invalid_cursor_exception from e
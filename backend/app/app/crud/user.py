@@ -1,39 +1,96 @@
+from datetime import UTC, datetime
+from uuid import UUID
+
+from sqlalchemy import Row, func
+from sqlalchemy.sql import ColumnElement
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pubsub import InvalidationChannel
+from app.core.security import password_hasher
+from app.core.singleflight import coalesce
+from app.core.token_versions import token_versions
 from app.crud.base import CRUDBase
-from app.models.user import User, UserCreate, UserUpdate
+from app.crud.item_cache import item_cache
+from app.models.item import Item
+from app.models.user import User, UserCreate, UserFilters, UserOut, UserUpdate
+
+# Snapshots of authenticated users keyed by id, see `get_current_user`
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+user_invalidations = InvalidationChannel("user-invalidations")
+user_invalidations.subscribe(user_cache.pop, resync=user_cache.clear)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    @coalesce(lambda self, session, id: id)
+    async def get_out(self, session: AsyncSession, id: UUID) -> Row | None:
+        """Return the `UserOut` columns and `updated_at` of the user.
+
+        Identical concurrent lookups, e.g. of `GET /users/me`, share one query.
+        """
+        query = self._select(UserOut, "updated_at").where(User.id == id)
+        return (await session.exec(query)).first()
+
     async def get_by_email(self, session: AsyncSession, email: str) -> User | None:
-        query = select(self.model).where(self.model.email == email)
+        """Find a user by email whatever its case, with the `lower(email)` index."""
+        query = select(self.model).where(func.lower(self.model.email) == email.lower())
         result = await session.exec(query)
         return result.first()
 
+    @staticmethod
+    def filter_by(filters: UserFilters) -> list[ColumnElement[bool]]:
+        """Translate the filters of `read_users` into conditions on indexed columns."""
+        whereclause = []
+        if filters.email:
+            whereclause.append(
+                func.lower(User.email).startswith(
+                    filters.email.lower(), autoescape=True
+                )
+            )
+        if filters.is_active is not None:
+            whereclause.append(User.is_active == filters.is_active)
+        if filters.is_superuser is not None:
+            whereclause.append(User.is_superuser == filters.is_superuser)
+        if filters.created_after is not None:
+            whereclause.append(User.created_at >= _naive_utc(filters.created_after))
+        if filters.created_before is not None:
+            whereclause.append(User.created_at < _naive_utc(filters.created_before))
+        return whereclause
+
     async def create(
         self, session: AsyncSession, obj_in: UserCreate, is_superuser: bool = False
     ) -> User:
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=await password_hasher.hash(obj_in.password),
             is_superuser=is_superuser,
         )
-        session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
-        return db_obj
+        return await self._insert(session, db_obj)
 
     async def update(
         self, session: AsyncSession, db_obj: User, obj_in: UserUpdate
     ) -> User:
         obj_data = obj_in.model_dump(exclude_unset=True)
         if password := obj_data.get("password"):
-            hashed_password = get_password_hash(password)
+            hashed_password = await password_hasher.hash(password)
             del obj_data["password"]
             obj_data["hashed_password"] = hashed_password
-        return await super().update(session, db_obj=db_obj, obj_in=obj_data)
+            # Revoke the tokens issued with the old password
+            obj_data["token_version"] = db_obj.token_version + 1
+        db_obj = await super().update(session, db_obj=db_obj, obj_in=obj_data)
+        await user_invalidations.publish(str(db_obj.id))
+        if "token_version" in obj_data:
+            await token_versions.set(db_obj.id, db_obj.token_version)
+        return db_obj
 
     async def authenticate(
         self, session: AsyncSession, email: str, password: str
@@ -41,7 +98,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         user = await self.get_by_email(session, email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             return None
         return user
 
@@ -49,7 +106,18 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         db_obj.is_active = True
         session.add(db_obj)
         await session.commit()
+        await user_invalidations.publish(str(db_obj.id))
         return True
 
+    async def delete(self, session: AsyncSession, db_obj: User) -> None:
+        # The items are deleted with the user, their cache entries as well
+        item_ids = (
+            await session.exec(select(Item.id).where(Item.owner_id == db_obj.id))
+        ).all()
+        await super().delete(session, db_obj)
+        await item_cache.invalidate(item_ids=item_ids, owner_ids=[db_obj.id])
+        await user_invalidations.publish(str(db_obj.id))
+        await token_versions.set(db_obj.id, db_obj.token_version + 1)
+
 
 crud_user = CRUDUser(User)
@@ -0,0 +1,168 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from enum import IntEnum
+
+from app.api.utils import database_busy_exception
+from app.core.config import settings
+from app.models.internal import AdmissionStats
+
+
+class Priority(IntEnum):
+    NORMAL = 0
+    # Lists and exports, admitted after the waiting normal requests
+    HEAVY = 1
+
+
+class AdmissionController:
+    def __init__(  # noqa: PLR0913
+        self,
+        capacity: int,
+        reserved: int,
+        max_queue: int,
+        max_wait: float,
+        target_delay: float,
+        interval: float,
+    ):
+        """Admit database work up to the capacity of the pool, shed the excess.
+
+        Requests beyond the capacity wait in a queue per priority instead of
+        in the pool, normal ones first, and are rejected with a 503 when the
+        queue is full or after `max_wait`. As in CoDel, once the queue delay
+        has stayed above `target_delay` for `interval`, heavy requests which
+        would have to wait are rejected right away until the delay drops.
+
+        **Parameters**
+
+        * `capacity`: number of requests doing database work concurrently
+        * `reserved`: part of the capacity only used by normal requests
+        * `max_queue`: number of waiting requests before new ones are rejected
+        * `max_wait`: time a request waits to be admitted, in seconds
+        * `target_delay`: acceptable queue delay, in seconds
+        * `interval`: time the delay stays above target before shedding
+        """
+        self.capacity = capacity
+        self.reserved = min(reserved, capacity - 1)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.target_delay = target_delay
+        self.interval = interval
+        self._queues: dict[Priority, deque[tuple[asyncio.Future, float]]] = {
+            priority: deque() for priority in Priority
+        }
+        self._above_target_until: float | None = None
+        self.shedding = False
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.max_delay = 0.0
+
+    def _limit(self, priority: Priority) -> int:
+        return self.capacity - (self.reserved if priority == Priority.HEAVY else 0)
+
+    def _waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def admit(
+        self, priority: Priority = Priority.NORMAL, wait: bool = False
+    ) -> AsyncIterator[None]:
+        """Hold a place among the requests doing database work.
+
+        With `wait`, for work which can no longer be rejected, e.g. a response
+        being streamed, the request waits as long as needed instead.
+        """
+        await self._acquire(priority, wait)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: Priority, wait: bool) -> None:
+        # Requests do not overtake the waiting ones of the same priority
+        ahead = any(self._queues[p] for p in Priority if p <= priority)
+        if not ahead and self.in_flight < self._limit(priority):
+            self._start(0)
+            return
+        if not wait:
+            if self._waiting() >= self.max_queue:
+                self.rejected += 1
+                raise database_busy_exception
+            if self.shedding and priority == Priority.HEAVY:
+                self.shed += 1
+                raise database_busy_exception
+        future = asyncio.get_running_loop().create_future()
+        waiter = (future, time.monotonic())
+        self._queues[priority].append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait([future], timeout=None if wait else self.max_wait)
+        except asyncio.CancelledError:
+            if future.done():
+                # Admitted as the request was cancelled
+                self._release()
+            else:
+                self._queues[priority].remove(waiter)
+            raise
+        if not future.done():
+            self._queues[priority].remove(waiter)
+            self.timeouts += 1
+            raise database_busy_exception
+
+    def _start(self, delay: float) -> None:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.admitted += 1
+        self.max_delay = max(self.max_delay, delay)
+        now = time.monotonic()
+        if delay < self.target_delay:
+            self._above_target_until = None
+            self.shedding = False
+        elif self._above_target_until is None:
+            self._above_target_until = now + self.interval
+        elif now >= self._above_target_until:
+            self.shedding = True
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        for priority in Priority:
+            queue = self._queues[priority]
+            while queue and self.in_flight < self._limit(priority):
+                future, enqueued_at = queue.popleft()
+                self._start(time.monotonic() - enqueued_at)
+                future.set_result(None)
+            if queue:
+                # Lower priorities wait for this one
+                break
+
+    def stats(self) -> AdmissionStats:
+        return AdmissionStats(
+            capacity=self.capacity,
+            reserved=self.reserved,
+            in_flight=self.in_flight,
+            peak_in_flight=self.peak_in_flight,
+            waiting=self._waiting(),
+            shedding=self.shedding,
+            admitted=self.admitted,
+            queued=self.queued,
+            rejected=self.rejected,
+            shed=self.shed,
+            timeouts=self.timeouts,
+            max_delay_seconds=self.max_delay,
+        )
+
+
+admission = AdmissionController(
+    capacity=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    reserved=settings.ADMISSION_RESERVED_SESSIONS,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    max_wait=settings.ADMISSION_MAX_WAIT_SECONDS,
+    target_delay=settings.ADMISSION_TARGET_DELAY_SECONDS,
+    interval=settings.ADMISSION_INTERVAL_SECONDS,
+)
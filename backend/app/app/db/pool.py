@@ -0,0 +1,111 @@
+import asyncio
+import bisect
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.models.internal import PoolStats
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the checkout wait histogram, in seconds
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+
+
+class PoolMetrics:
+    def __init__(self):
+        """Checkout waits and connection churn of the instrumented pools."""
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+
+    def attach(self, engine: AsyncEngine) -> None:
+        """Count the connections opened, closed and invalidated by the engine."""
+
+        def on_connect(dbapi_connection, connection_record) -> None:
+            self.connects += 1
+
+        def on_close(dbapi_connection, connection_record) -> None:
+            self.closes += 1
+
+        def on_invalidate(dbapi_connection, connection_record, exception) -> None:
+            self.invalidations += 1
+
+        event.listen(engine.sync_engine, "connect", on_connect)
+        event.listen(engine.sync_engine, "close", on_close)
+        event.listen(engine.sync_engine, "invalidate", on_invalidate)
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait_counts[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def stats(self, pool: Pool) -> PoolStats:
+        # Cumulative counts, as Prometheus histograms
+        histogram, count = {}, 0
+        for bound, bucket_count in zip(
+            [*map(str, WAIT_BUCKETS), "+Inf"], self.wait_counts, strict=True
+        ):
+            count += bucket_count
+            histogram[bound] = count
+        queue_pool = isinstance(pool, QueuePool)
+        return PoolStats(
+            pool=type(pool).__name__,
+            size=pool.size() if queue_pool else 0,
+            checked_in=pool.checkedin() if queue_pool else 0,
+            checked_out=pool.checkedout() if queue_pool else 0,
+            overflow=max(pool.overflow(), 0) if queue_pool else 0,
+            checkouts=count,
+            wait_seconds_total=self.wait_seconds_total,
+            wait_seconds_max=self.wait_seconds_max,
+            wait_histogram=histogram,
+            timeouts=self.timeouts,
+            connects=self.connects,
+            closes=self.closes,
+            invalidations=self.invalidations,
+        )
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool of asyncio engines which times checkouts in `pool_metrics`.
+
+    The wait includes opening a connection when the pool has none idle.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.observe_wait(time.perf_counter() - start)
+
+
+async def warm_up(engine: AsyncEngine) -> None:
+    """Open the `pool_size` connections of the engine before the first requests."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    connections = [engine.connect() for _ in range(pool.size())]
+    results = await asyncio.gather(
+        *(connection.start() for connection in connections), return_exceptions=True
+    )
+    for connection, result in zip(connections, results, strict=True):
+        if isinstance(result, BaseException):
+            # The pool fills up on demand instead
+            logger.error("Failed to warm up a pooled connection: %r", result)
+        else:
+            await connection.close()
@@ -1,17 +1,31 @@
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.pool import NullPool
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool, pool_metrics
+
+# Asincio pytest works with NullPool
+if settings.ENVIRONMENT == "PYTEST":
+    pool_options = {"poolclass": NullPool}
+else:
+    pool_options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
 
 engine = create_async_engine(
     settings.ASYNC_DATABASE_URI,
     echo=False,
     future=True,
-    # Asincio pytest works with NullPool
-    poolclass=NullPool if settings.ENVIRONMENT == "PYTEST" else QueuePool,
+    **pool_options,
 )
+pool_metrics.attach(engine)
 
 
 SessionLocal = sessionmaker(
@@ -1,7 +1,9 @@
 """Main FastAPI app instance declaration."""
 
+import asyncio
 import logging
 import time
+from contextlib import asynccontextmanager
 
 from celery.signals import after_setup_logger
 from fastapi import FastAPI
@@ -11,6 +13,10 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.api.api import api_router
 from app.core.celery_app import create_celery
 from app.core.config import settings
+from app.core.security import password_hasher
+from app.crud.user import user_invalidations
+from app.db import pool
+from app.db.session import engine
 
 logging.basicConfig(
     filename="logs/app.log",
@@ -20,12 +26,23 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    listener = asyncio.create_task(user_invalidations.listen())
+    if settings.DB_POOL_WARM_UP:
+        await pool.warm_up(engine)
+    yield
+    listener.cancel()
+    password_hasher.shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description=settings.DESCRIPTION,
     openapi_url="/openapi.json",
     docs_url="/",
+    lifespan=lifespan,
 )
 app.include_router(api_router)
 
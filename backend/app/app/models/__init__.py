@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel
 
-from .item import Item
+from .item import Item, ItemCount
+from .item_import import ItemImportJob, ItemImportRow
 from .user import User
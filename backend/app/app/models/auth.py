@@ -1,4 +1,5 @@
 from datetime import datetime
+from uuid import UUID
 
 from pydantic import ConfigDict
 from sqlmodel import SQLModel
@@ -21,6 +22,16 @@ class JWTTokenPayload(SQLModel):
     exp: datetime
     nbf: datetime
     type: str
+    # Only set on tokens issued with ACCESS_TOKEN_CLAIMS enabled
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+    ver: int | None = None
+
+
+class UserClaims(SQLModel):
+    id: UUID
+    is_active: bool
+    is_superuser: bool
 
 
 class NewPassword(SQLModel):
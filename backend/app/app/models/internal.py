@@ -0,0 +1,76 @@
+from sqlmodel import SQLModel
+
+
+class PasswordHasherStats(SQLModel):
+    executor: str
+    max_workers: int
+    max_pending: int
+    in_flight: int
+    queue_depth: int
+    peak_in_flight: int
+    completed: int
+    rejected: int
+
+
+class CacheStats(SQLModel):
+    maxsize: int
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+
+
+class ItemCacheStats(SQLModel):
+    backend: str
+    hits: int
+    misses: int
+    fills: int
+    waits: int
+    wait_timeouts: int
+    invalidations: int
+    errors: int
+
+
+class SingleFlightStats(SQLModel):
+    in_flight: int
+    calls: int
+    executions: int
+    # Reads served with the result of another, i.e. queries saved
+    coalesced: int
+    timeouts: int
+
+
+class PoolStats(SQLModel):
+    pool: str
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    # Number of checkouts which waited at most each number of seconds
+    wait_histogram: dict[str, int]
+    timeouts: int
+    # Connection churn
+    connects: int
+    closes: int
+    invalidations: int
+
+
+class AdmissionStats(SQLModel):
+    capacity: int
+    reserved: int
+    in_flight: int
+    peak_in_flight: int
+    waiting: int
+    shedding: bool
+    admitted: int
+    queued: int
+    # Rejected as the queue was full, shed as heavy while the delay was high
+    rejected: int
+    shed: int
+    timeouts: int
+    max_delay_seconds: float
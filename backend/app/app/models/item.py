@@ -1,10 +1,13 @@
 from datetime import datetime
 from uuid import UUID
 
-from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import DDL, BigInteger, Column, Computed, ForeignKey, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlmodel import Field, Index, Relationship, SQLModel
+from sqlmodel.sql.sqltypes import GUID
 
 from .base_uuid_model import BaseUUIDModel
-from .user import User
+from .user import User, UserOut
 
 
 class ItemBase(SQLModel):
@@ -21,12 +24,82 @@ class ItemUpdate(ItemBase):
 
 
 class Item(BaseUUIDModel, ItemBase, table=True):
+    __table_args__ = (
+        Index("ix_item_created_at_id", "created_at", "id"),
+        Index("ix_item_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        # Prefix and fuzzy matches of titles, see CRUDItem.search
+        Index(
+            "ix_item_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
+
     title: str
     owner_id: UUID | None = Field(default=None, foreign_key="user.id")
     owner: User | None = Relationship(back_populates="items")
 
 
+# Computed by Postgres and only used in queries, so left out of the model
+# fields to be neither loaded with items nor written by inserts
+SEARCH_CONFIG = "english"
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A')"
+    f" || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
+Item.__table__.append_column(
+    Column("search_vector", TSVECTOR, Computed(SEARCH_VECTOR, persisted=True))
+)
+Index("ix_item_search_vector", Item.__table__.c.search_vector, postgresql_using="gin")
+event.listen(
+    SQLModel.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
+
+
+class ItemCount(SQLModel, table=True):
+    """Number of items of an owner, kept up to date by the writes of CRUDItem."""
+
+    __tablename__ = "item_count"
+
+    owner_id: UUID = Field(
+        sa_column=Column(
+            GUID, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+        )
+    )
+    count: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+
+
 class ItemOut(BaseUUIDModel, ItemBase):
     updated_at: datetime
     created_at: datetime
     owner_id: UUID
+
+
+class ItemOutWithOwner(ItemOut):
+    owner: UserOut
+
+
+# Defined here rather than next to UserOut, which cannot import ItemOut
+class UserOutWithItems(UserOut):
+    items: list[ItemOut]
+
+
+class ItemBulkUpdate(ItemUpdate):
+    id: UUID
+
+
+class BulkError(SQLModel):
+    index: int
+    id: UUID | None = None
+    detail: str
+
+
+class ItemBulkOut(SQLModel):
+    items: list[ItemOut] = []
+    errors: list[BulkError] = []
+
+
+class ItemBulkDeleteOut(SQLModel):
+    ids: list[UUID] = []
+    errors: list[BulkError] = []
@@ -0,0 +1,45 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import Column, ForeignKey
+from sqlmodel import Field, SQLModel
+from sqlmodel.sql.sqltypes import GUID
+
+from .item import BulkError
+
+
+class ItemImportRow(SQLModel, table=True):
+    """Staging row of an item import, merged into `item` once validated."""
+
+    __tablename__ = "item_import"
+    # Staging data is disposable, skip the write-ahead log
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    id: UUID = Field(primary_key=True)
+    job_id: UUID = Field(index=True)
+    title: str
+    description: str | None = None
+    created_at: datetime
+
+
+class ItemImportJob(SQLModel, table=True):
+    """Background item import, whose status only its owner may read."""
+
+    __tablename__ = "item_import_job"
+
+    id: UUID = Field(primary_key=True)
+    owner_id: UUID = Field(
+        sa_column=Column(
+            GUID, ForeignKey("user.id", ondelete="CASCADE"), nullable=False
+        )
+    )
+    # Jobs and their staged rows expire after ITEM_IMPORT_JOB_EXPIRE_SECONDS
+    created_at: datetime = Field(index=True)
+
+
+class ItemImportOut(SQLModel):
+    job_id: UUID
+    status: str
+    staged: int
+    imported: int | None = None
+    errors: list[BulkError] = []
@@ -1,8 +1,10 @@
-from typing import TYPE_CHECKING
+from datetime import datetime
+from typing import TYPE_CHECKING, Annotated, ClassVar
 from uuid import UUID
 
-from pydantic import EmailStr, computed_field
-from sqlmodel import Column, Field, Relationship, SQLModel, String
+from pydantic import AfterValidator, EmailStr, computed_field
+from sqlalchemy import func, text
+from sqlmodel import Column, Field, Index, Relationship, SQLModel, String
 
 from .base_uuid_model import BaseUUIDModel
 
@@ -10,8 +12,12 @@ if TYPE_CHECKING:
     from .item import Item
 
 
+# Emails are stored and looked up in lowercase, see CRUDUser.get_by_email
+Email = Annotated[EmailStr, AfterValidator(str.lower)]
+
+
 class UserBase(SQLModel):
-    email: EmailStr = Field(sa_column=Column(String, index=True, unique=True))
+    email: EmailStr = Field(sa_column=Column(String))
     is_active: bool = False
     is_superuser: bool = False
     first_name: str | None = None
@@ -22,7 +28,7 @@ class UserBase(SQLModel):
 
 
 class UserCreate(SQLModel):
-    email: EmailStr
+    email: Email
     password: str
 
 
@@ -36,11 +42,46 @@ class UserUpdatePassword(SQLModel):
 
 
 class UserRecoverPassword(SQLModel):
-    email: EmailStr
+    email: Email
+
+
+class UserFilters(SQLModel):
+    email: str | None = Field(default=None, description="Email prefix")
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
 
 
 class User(BaseUUIDModel, UserBase, table=True):
+    __table_args__ = (
+        Index("ix_user_created_at_id", "created_at", "id"),
+        # Case-insensitive unique emails, which also serves the email prefix
+        # filter of read_users
+        Index(
+            "ix_user_lower_email",
+            func.lower(text("email")).label("lower_email"),
+            unique=True,
+            postgresql_ops={"lower_email": "text_pattern_ops"},
+        ),
+        # Few users are inactive or superusers
+        Index(
+            "ix_user_inactive_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=text("NOT is_active"),
+        ),
+        Index(
+            "ix_user_superuser_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=text("is_superuser"),
+        ),
+    )
+
     hashed_password: str
+    # Bumped to revoke the tokens issued so far, see ACCESS_TOKEN_CLAIMS
+    token_version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     items: list["Item"] = Relationship(
         back_populates="owner", sa_relationship_kwargs={"cascade": "all, delete"}
     )
@@ -48,6 +89,10 @@ class User(BaseUUIDModel, UserBase, table=True):
 
 class UserOut(UserBase):
     id: UUID
+    # Fields the computed fields are made of, see `sparse_schema`
+    computed_field_sources: ClassVar[dict[str, tuple[str, ...]]] = {
+        "full_name": ("first_name", "last_name")
+    }
 
     @computed_field
     def full_name(self) -> str:
@@ -0,0 +1,31 @@
+"""Measure access token decoding throughput with and without `token_cache`.
+
+Run with `python -m app.scripts.bench_decode_token`.
+"""
+
+import timeit
+import uuid
+
+from app.core.config import settings
+from app.core.token_utils import TokenType, create_token, decode_token, token_cache
+
+NUMBER = 20_000
+
+
+def main() -> None:
+    token = create_token(
+        uuid.uuid4(), settings.ACCESS_TOKEN_EXPIRE_HOURS, TokenType.ACCESS
+    )
+    maxsize = token_cache.maxsize
+    for label, size in [("without cache", 0), ("with cache", maxsize or 1)]:
+        token_cache.clear()
+        token_cache.maxsize = size
+        seconds = timeit.timeit(
+            lambda: decode_token(token, TokenType.ACCESS), number=NUMBER
+        )
+        print(f"{label}: {NUMBER / seconds:,.0f} decodes/s")
+    token_cache.maxsize = maxsize
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure `GET /items/?limit=100` throughput with and without `LIST_PROJECTION`.
+
+Run with `python -m app.scripts.bench_list_items` against a local database,
+it creates and deletes its own user and items. The cache of list pages is
+disabled, so that every request reads the page from the database.
+"""
+
+import asyncio
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from app.core.token_utils import TokenType, create_token
+from app.crud.item_cache import item_cache
+from app.crud.user import crud_user
+from app.db.session import SessionLocal, engine
+from app.main import app
+from app.models.item import Item
+from app.models.user import UserCreate
+
+ITEMS = 100
+REQUESTS = 2_000
+
+
+async def main() -> None:
+    async with SessionLocal() as session:
+        user = await crud_user.create(
+            session,
+            UserCreate(email="bench-list-items@example.com", password="benchmark"),
+        )
+        await crud_user.activate(session, user)
+        session.add_all(Item(title=f"item {i}", owner_id=user.id) for i in range(ITEMS))
+        await session.commit()
+    token = create_token(user.id, settings.ACCESS_TOKEN_EXPIRE_HOURS, TokenType.ACCESS)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    projection, list_ttl = settings.LIST_PROJECTION, item_cache.list_ttl
+    item_cache.list_ttl = 0
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost"
+        ) as client:
+            for label, enabled in [("entities", False), ("projection", True)]:
+                settings.LIST_PROJECTION = enabled
+                start = time.perf_counter()
+                for _ in range(REQUESTS):
+                    response = await client.get(
+                        "/items/", headers=headers, params={"limit": ITEMS}
+                    )
+                    response.raise_for_status()
+                seconds = time.perf_counter() - start
+                print(f"{label}: {REQUESTS / seconds:,.0f} requests/s")
+    finally:
+        settings.LIST_PROJECTION, item_cache.list_ttl = projection, list_ttl
+        async with SessionLocal() as session:
+            await crud_user.delete(session, user)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+"""Compare uuid4 and uuid7 primary keys on insert throughput and index size.
+
+Run with `python -m app.scripts.bench_uuid_insert` against a local database,
+it creates and drops its own tables.
+"""
+
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy import text
+
+from app.core.ids import uuid7
+from app.db.session import engine
+
+ROWS = 200_000
+BATCH_SIZE = 1_000
+
+
+async def bench(name: str, generate_id) -> None:
+    table = f"bench_{name}"
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await conn.execute(text(f"CREATE TABLE {table} (id uuid PRIMARY KEY)"))
+
+    start = time.perf_counter()
+    for _ in range(ROWS // BATCH_SIZE):
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(f"INSERT INTO {table} (id) VALUES (:id)"),  # noqa: S608
+                [{"id": generate_id()} for _ in range(BATCH_SIZE)],
+            )
+    seconds = time.perf_counter() - start
+
+    async with engine.begin() as conn:
+        index_size = await conn.scalar(text(f"SELECT pg_relation_size('{table}_pkey')"))
+        await conn.execute(text(f"DROP TABLE {table}"))
+    print(
+        f"{name}: {ROWS / seconds:,.0f} inserts/s, "
+        f"primary key index {index_size / 2**20:.1f} MiB"
+    )
+
+
+async def main() -> None:
+    await bench("uuid4", uuid4)
+    await bench("uuid7", uuid7)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
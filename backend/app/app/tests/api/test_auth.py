@@ -1,9 +1,17 @@
+import pytest
 from fastapi import status
 from httpx import AsyncClient
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.config import settings
+from app.core.config import Settings, settings
+from app.core.token_utils import TokenType, create_token, user_claims
+from app.core.token_versions import token_versions
+from app.crud.user import crud_user
 from app.main import app
-from app.models.user import User
+from app.models.user import User, UserUpdatePassword
+from app.tests.utils.utils import count_queries, random_lower_string
 
 
 async def test_get_access_token(client: AsyncClient, superuser: User) -> None:
@@ -15,3 +23,93 @@ async def test_get_access_token(client: AsyncClient, superuser: User) -> None:
     tokens = r.json()
     assert r.status_code == status.HTTP_200_OK
     assert tokens["access_token"]
+
+
+async def test_email_is_case_insensitive(
+    client: AsyncClient, superuser: User, session: AsyncSession
+) -> None:
+    login_data = {
+        "username": settings.TEST_USER_EMAIL.upper(),
+        "password": settings.TEST_USER_PASSWORD,
+    }
+    r = await client.post(app.url_path_for("login_access_token"), data=login_data)
+    assert r.status_code == status.HTTP_200_OK
+
+    data = {"email": settings.TEST_USER_EMAIL.upper(), "password": "password"}
+    r = await client.post(app.url_path_for("register_user"), json=data)
+    assert r.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_refresh_token(client: AsyncClient, superuser: User) -> None:
+    login_data = {
+        "username": settings.TEST_USER_EMAIL,
+        "password": settings.TEST_USER_PASSWORD,
+    }
+    r = await client.post(app.url_path_for("login_access_token"), data=login_data)
+    tokens = r.json()
+    r = await client.post(
+        app.url_path_for("refresh_token"),
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["access_token"]
+
+
+async def test_access_token_claims(
+    client: AsyncClient,
+    session: AsyncSession,
+    normal_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_CLAIMS", True)
+    access_token = create_token(
+        normal_user.id,
+        settings.ACCESS_TOKEN_EXPIRE_HOURS,
+        TokenType.ACCESS,
+        user_claims(normal_user),
+    )
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # The user is not loaded for endpoints which only need the claims
+    with count_queries() as statements:
+        r = await client.get(app.url_path_for("read_items"), headers=headers)
+    assert r.status_code == status.HTTP_200_OK
+    assert len(statements) == 1
+
+    # Changing the password revokes the token
+    await crud_user.update(
+        session, normal_user, UserUpdatePassword(password=random_lower_string())
+    )
+    r = await client.get(app.url_path_for("read_items"), headers=headers)
+    assert r.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_access_token_claims_without_redis(
+    client: AsyncClient,
+    session: AsyncSession,
+    normal_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    with pytest.raises(ValidationError):
+        Settings(ACCESS_TOKEN_CLAIMS=True, REDIS_URL="")
+
+    async def unreachable(user_id) -> int:
+        raise RedisError
+
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_CLAIMS", True)
+    monkeypatch.setattr(token_versions, "get", unreachable)
+    access_token = create_token(
+        normal_user.id,
+        settings.ACCESS_TOKEN_EXPIRE_HOURS,
+        TokenType.ACCESS,
+        user_claims(normal_user),
+    )
+    headers = {"Authorization": f"Bearer {access_token}"}
+    # The token is checked against the user row instead
+    r = await client.get(app.url_path_for("read_items"), headers=headers)
+    assert r.status_code == status.HTTP_200_OK
+    await crud_user.update(
+        session, normal_user, UserUpdatePassword(password=random_lower_string())
+    )
+    r = await client.get(app.url_path_for("read_items"), headers=headers)
+    assert r.status_code == status.HTTP_401_UNAUTHORIZED
@@ -1,11 +1,27 @@
+import json
+from uuid import UUID, uuid4
+
+import pytest
+from asyncpg import ForeignKeyViolationError
 from fastapi import status
 from httpx import AsyncClient
+from sqlalchemy import func
+from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.api.routers import items as items_router
+from app.core.config import settings
+from app.crud import item_import
+from app.crud.item import crud_item
+from app.crud.user import crud_user
+from app.db.session import SessionLocal
 from app.main import app
-from app.models.user import User
+from app.models.item import ItemCreate
+from app.models.item_import import ItemImportRow
+from app.models.user import User, UserCreate
 from app.tests.utils.item import create_random_item
-from app.tests.utils.utils import random_lower_string
+from app.tests.utils.user import get_user_authentication_headers
+from app.tests.utils.utils import count_queries, random_email, random_lower_string
 
 
 async def test_create_item(
@@ -42,3 +58,620 @@ async def test_read_item(
     assert content["description"] == item.description
     assert content["id"] == str(item.id)
     assert content["owner_id"] == str(item.owner_id)
+
+
+async def test_read_items_by_cursor(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    items = [await create_random_item(session, normal_user.id) for _ in range(3)]
+    url = app.url_path_for("read_items")
+    r = await client.get(
+        url, headers=normal_user_token_headers, params={"cursor": "", "limit": 2}
+    )
+    assert r.status_code == status.HTTP_200_OK
+    first_page = r.json()
+    assert [item["id"] for item in first_page["items"]] == [
+        str(item.id) for item in items[:2]
+    ]
+    assert first_page["next_cursor"]
+
+    r = await client.get(
+        url,
+        headers=normal_user_token_headers,
+        params={"cursor": first_page["next_cursor"], "limit": 2},
+    )
+    second_page = r.json()
+    assert [item["id"] for item in second_page["items"]] == [str(items[2].id)]
+    assert second_page["next_cursor"] is None
+
+
+async def test_read_items_fields(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    items = [await create_random_item(session, normal_user.id) for _ in range(3)]
+    url = app.url_path_for("read_items")
+    params = {"fields": "id,title", "cursor": "", "limit": 2}
+    r = await client.get(url, headers=normal_user_token_headers, params=params)
+    first_page = r.json()
+    assert first_page["items"] == [
+        {"id": str(item.id), "title": item.title} for item in items[:2]
+    ]
+    # The cursor does not depend on the fields
+    params["cursor"] = first_page["next_cursor"]
+    r = await client.get(url, headers=normal_user_token_headers, params=params)
+    assert r.json()["items"] == [{"id": str(items[2].id), "title": items[2].title}]
+
+    r = await client.get(
+        app.url_path_for("read_item", item_id=items[0].id),
+        headers=normal_user_token_headers,
+        params={"fields": "title"},
+    )
+    assert r.json() == {"title": items[0].title}
+
+    for fields in ["", "title,owner"]:
+        r = await client.get(
+            url, headers=normal_user_token_headers, params={"fields": fields}
+        )
+        assert r.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_read_items_expand_owner(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    for _ in range(5):
+        await create_random_item(session, normal_user.id)
+    url = app.url_path_for("read_items")
+    # Cache the user for the next request
+    await client.get(url, headers=normal_user_token_headers)
+    with count_queries() as statements:
+        r = await client.get(
+            url, headers=normal_user_token_headers, params={"expand": "owner"}
+        )
+    assert r.status_code == status.HTTP_200_OK
+    owners = {item["owner"]["email"] for item in r.json()}
+    assert owners == {normal_user.email}
+    # The items and their owners, not one query per item
+    assert len(statements) == 2  # noqa: PLR2004
+
+    r = await client.get(
+        app.url_path_for("read_item", item_id=r.json()[0]["id"]),
+        headers=normal_user_token_headers,
+        params={"expand": "owner", "fields": "title,owner"},
+    )
+    assert r.json().keys() == {"title", "owner"}
+    assert r.json()["owner"]["id"] == str(normal_user.id)
+
+
+async def test_search_items(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    other_user = await crud_user.create(
+        session, UserCreate(email=random_email(), password=random_lower_string())
+    )
+    item_in = ItemCreate(title="Apple pie")
+    item = await crud_item.create_with_owner(session, item_in, normal_user.id)
+    await crud_item.create_with_owner(session, item_in, other_user.id)
+    url = app.url_path_for("search_items")
+    r = await client.get(url, headers=normal_user_token_headers, params={"q": "apple"})
+    assert r.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in r.json()["items"]] == [str(item.id)]
+    r = await client.get(url, headers=normal_user_token_headers, params={"q": ""})
+    assert r.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_read_items_invalid_cursor(
+    client: AsyncClient, normal_user_token_headers: dict
+) -> None:
+    r = await client.get(
+        app.url_path_for("read_items"),
+        headers=normal_user_token_headers,
+        params={"cursor": "invalid"},
+    )
+    assert r.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_update_item(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    item = await create_random_item(session, normal_user.id)
+    data = {"title": random_lower_string()}
+    with count_queries() as statements:
+        response = await client.patch(
+            app.url_path_for("update_item", item_id=item.id),
+            headers=normal_user_token_headers,
+            json=data,
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == data["title"]
+    assert response.json()["description"] == item.description
+    # The user snapshot and the owner-scoped UPDATE ... RETURNING
+    assert len(statements) <= 2  # noqa: PLR2004
+
+
+async def test_update_item_of_other_user(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+) -> None:
+    other_user = await crud_user.create(
+        session, UserCreate(email=random_email(), password=random_lower_string())
+    )
+    item = await create_random_item(session, other_user.id)
+    response = await client.patch(
+        app.url_path_for("update_item", item_id=item.id),
+        headers=normal_user_token_headers,
+        json={"title": random_lower_string()},
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = await client.delete(
+        app.url_path_for("delete_item", item_id=item.id),
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_delete_item(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    item = await create_random_item(session, normal_user.id)
+    url = app.url_path_for("delete_item", item_id=item.id)
+    response = await client.delete(url, headers=normal_user_token_headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await client.delete(url, headers=normal_user_token_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_bulk_items(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+) -> None:
+    data = [{"title": random_lower_string()} for _ in range(3)]
+    data.insert(1, {"description": "missing title"})
+    response = await client.post(
+        app.url_path_for("create_items_for_user"),
+        headers=normal_user_token_headers,
+        json=data,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    content = response.json()
+    assert [item["title"] for item in content["items"]] == [
+        item["title"] for item in data if "title" in item
+    ]
+    assert [error["index"] for error in content["errors"]] == [1]
+    ids = [item["id"] for item in content["items"]]
+
+    other_user = await crud_user.create(
+        session, UserCreate(email=random_email(), password=random_lower_string())
+    )
+    other_item = await create_random_item(session, other_user.id)
+    data = [{"id": item_id, "description": "updated"} for item_id in ids]
+    data.append({"id": str(other_item.id), "description": "updated"})
+    response = await client.patch(
+        app.url_path_for("update_items"), headers=normal_user_token_headers, json=data
+    )
+    assert response.status_code == status.HTTP_200_OK
+    content = response.json()
+    assert [item["id"] for item in content["items"]] == ids
+    assert all(item["description"] == "updated" for item in content["items"])
+    assert content["errors"] == [
+        {"index": 3, "id": str(other_item.id), "detail": "Not enough permissions"}
+    ]
+
+    response = await client.request(
+        "DELETE",
+        app.url_path_for("delete_items"),
+        headers=normal_user_token_headers,
+        json=[*ids, str(uuid4()), ids[0]],
+    )
+    assert response.status_code == status.HTTP_200_OK
+    content = response.json()
+    assert content["ids"] == ids
+    assert [error["detail"] for error in content["errors"]] == [
+        "Item not found",
+        "Duplicate item",
+    ]
+
+
+async def test_read_items_by_id(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    items = [await create_random_item(session, normal_user.id) for _ in range(2)]
+    other_user = await crud_user.create(
+        session, UserCreate(email=random_email(), password=random_lower_string())
+    )
+    other_item = await create_random_item(session, other_user.id)
+    missing_id = uuid4()
+    ids = [items[1].id, other_item.id, missing_id, items[0].id]
+    with count_queries() as statements:
+        response = await client.post(
+            app.url_path_for("read_items_by_id"),
+            headers=normal_user_token_headers,
+            json=[str(item_id) for item_id in ids],
+        )
+    assert response.status_code == status.HTTP_200_OK
+    content = response.json()
+    assert [item["id"] for item in content["items"]] == [
+        str(items[1].id),
+        str(items[0].id),
+    ]
+    assert content["errors"] == [
+        {"index": 1, "id": str(other_item.id), "detail": "Not enough permissions"},
+        {"index": 2, "id": str(missing_id), "detail": "Item not found"},
+    ]
+    # The user snapshot, the owned items and the owners of the others
+    assert len(statements) <= 3  # noqa: PLR2004
+
+
+async def test_import_items(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    lines = [
+        json.dumps({"title": "first", "description": "text"}),
+        "",
+        json.dumps({"description": "missing title"}),
+        "not json",
+        json.dumps({"title": "second"}),
+    ]
+
+    async def upload():
+        for line in lines:
+            yield f"{line}\n".encode()
+
+    response = await client.post(
+        app.url_path_for("import_items_for_user"),
+        headers=normal_user_token_headers,
+        content=upload(),
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    content = response.json()
+    assert content["staged"] == content["imported"] == 2  # noqa: PLR2004
+    assert [error["index"] for error in content["errors"]] == [1, 2]
+    items = await crud_item.list_by_owner(session, normal_user.id)
+    assert {item.title for item in items} == {"first", "second"}
+
+
+async def test_import_items_csv_in_background(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    tasks = []
+    monkeypatch.setattr(
+        item_import.merge_item_import,
+        "apply_async",
+        lambda args, task_id: tasks.append(args),
+    )
+    response = await client.post(
+        app.url_path_for("import_items_for_user"),
+        headers=normal_user_token_headers,
+        params={"format": "csv", "background": True},
+        content='title,description\nfirst,"multi\nline"\nsecond,\n',
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    content = response.json()
+    assert content["status"] == "PENDING"
+    assert content["staged"] == 2  # noqa: PLR2004
+    assert await crud_item.list_by_owner(session, normal_user.id) == []
+
+    job_id, user_id = tasks[0]
+    imported = await item_import._merge_job(UUID(job_id), UUID(user_id))  # noqa: SLF001
+    assert imported == 2  # noqa: PLR2004
+    items = await crud_item.list_by_owner(session, normal_user.id)
+    assert {(item.title, item.description) for item in items} == {
+        ("first", "multi\nline"),
+        ("second", None),
+    }
+
+
+async def test_import_items_commits_batches(
+    session: AsyncSession, normal_user: User, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "ITEM_IMPORT_BATCH_SIZE", 1)
+    job_id = uuid4()
+    seen = []
+
+    async def upload():
+        yield json.dumps({"title": "first"}).encode() + b"\n"
+        yield json.dumps({"title": "second"}).encode() + b"\n"
+        # The batches are committed while the upload goes on
+        query = select(func.count()).where(ItemImportRow.job_id == job_id)
+        seen.append((await session.exec(query)).one())
+        await session.commit()
+        raise ConnectionError
+
+    async with SessionLocal() as import_session:
+        with pytest.raises(ConnectionError):
+            await item_import.import_items(
+                import_session, job_id, normal_user.id, upload(), "ndjson"
+            )
+    assert seen == [2]
+    # The staged rows of the failed import are deleted
+    query = select(func.count()).where(ItemImportRow.job_id == job_id)
+    assert (await session.exec(query)).one() == 0
+    assert await item_import.get_job(session, job_id) is None
+
+
+async def test_read_import_job(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        item_import.merge_item_import, "apply_async", lambda args, task_id: None
+    )
+    monkeypatch.setattr(
+        items_router, "get_task_info", lambda task_id: {"task_id": task_id}
+    )
+    response = await client.post(
+        app.url_path_for("import_items_for_user"),
+        headers=normal_user_token_headers,
+        params={"background": True},
+        content=json.dumps({"title": "first"}),
+    )
+    url = app.url_path_for("read_import_job", job_id=response.json()["job_id"])
+    response = await client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    other_user = await crud_user.create(
+        session, UserCreate(email=random_email(), password=random_lower_string())
+    )
+    await crud_user.activate(session, other_user)
+    headers = await get_user_authentication_headers(other_user)
+    response = await client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_import_job_cleanup(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    tasks = []
+    monkeypatch.setattr(
+        item_import.merge_item_import,
+        "apply_async",
+        lambda args, task_id: tasks.append(args),
+    )
+
+    async def stage() -> UUID:
+        response = await client.post(
+            app.url_path_for("import_items_for_user"),
+            headers=normal_user_token_headers,
+            params={"background": True},
+            content=json.dumps({"title": "first"}),
+        )
+        return UUID(response.json()["job_id"])
+
+    async def staged(job_id: UUID) -> int:
+        query = select(func.count()).where(ItemImportRow.job_id == job_id)
+        return (await session.exec(query)).one()
+
+    # A failed merge deletes the staged rows
+    job_id = await stage()
+    with pytest.raises(ForeignKeyViolationError):
+        await item_import._merge_job(job_id, uuid4())  # noqa: SLF001
+    assert await staged(job_id) == 0
+
+    # The rows of a task which never ran expire with their job
+    job_id = await stage()
+    monkeypatch.setattr(settings, "ITEM_IMPORT_JOB_EXPIRE_SECONDS", 0)
+    await stage()
+    assert await staged(job_id) == 0
+    assert await item_import.get_job(session, job_id) is None
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+async def test_export_items(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+    format: str,
+) -> None:
+    items = [await create_random_item(session, normal_user.id) for _ in range(3)]
+    response = await client.get(
+        app.url_path_for("export_items"),
+        headers=normal_user_token_headers,
+        params={"format": format},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "attachment" in response.headers["content-disposition"]
+    lines = response.text.splitlines()
+    if format == "csv":
+        assert response.headers["content-type"].startswith("text/csv")
+        header, *lines = lines
+        assert header.split(",")[0] == "title"
+        ids = [line.split(",")[header.split(",").index("id")] for line in lines]
+    else:
+        ids = [json.loads(line)["id"] for line in lines]
+    assert ids == [str(item.id) for item in items]
+
+
+async def test_read_items_total(
+    client: AsyncClient, superuser_token_headers: dict, session: AsyncSession
+) -> None:
+    # The superuser and normal_user fixtures are the same user
+    user_in = UserCreate(email=random_email(), password=random_lower_string())
+    user = await crud_user.create(session, user_in)
+    await crud_user.activate(session, user)
+    user_token_headers = await get_user_authentication_headers(user)
+    for _ in range(3):
+        await create_random_item(session, user.id)
+    url = app.url_path_for("read_items")
+    response = await client.get(url, headers=user_token_headers)
+    assert "X-Total-Count" not in response.headers
+
+    response = await client.get(
+        url, headers=user_token_headers, params={"total": True, "limit": 1}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 1
+    assert response.headers["X-Total-Count"] == "3"
+
+    response = await client.get(
+        url, headers=superuser_token_headers, params={"total": True, "cursor": ""}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert int(response.headers["X-Total-Count-Estimate"]) >= 0
+
+
+@pytest.mark.usefixtures("_local_item_cache")
+async def test_read_item_cached(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    item = await create_random_item(session, normal_user.id)
+    url = app.url_path_for("read_item", item_id=item.id)
+    list_url = app.url_path_for("read_items")
+    await client.get(url, headers=normal_user_token_headers)
+    await client.get(list_url, headers=normal_user_token_headers)
+    with count_queries() as statements:
+        response = await client.get(url, headers=normal_user_token_headers)
+        list_response = await client.get(list_url, headers=normal_user_token_headers)
+    assert statements == []
+    assert response.json()["id"] == str(item.id)
+    assert [entry["id"] for entry in list_response.json()] == [str(item.id)]
+
+    # Writes invalidate the item and the pages of the owner
+    response = await client.patch(
+        url, headers=normal_user_token_headers, json={"title": "updated"}
+    )
+    other_item = await create_random_item(session, normal_user.id)
+    response = await client.get(url, headers=normal_user_token_headers)
+    assert response.json()["title"] == "updated"
+    list_response = await client.get(list_url, headers=normal_user_token_headers)
+    assert [entry["id"] for entry in list_response.json()] == [
+        str(item.id),
+        str(other_item.id),
+    ]
+    await client.delete(url, headers=normal_user_token_headers)
+    response = await client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.usefixtures("_local_item_cache")
+async def test_read_item_cached_owner_deleted(
+    client: AsyncClient, superuser_token_headers: dict, session: AsyncSession
+) -> None:
+    owner = await crud_user.create(
+        session, UserCreate(email=random_email(), password=random_lower_string())
+    )
+    item = await create_random_item(session, owner.id)
+    url = app.url_path_for("read_item", item_id=item.id)
+    response = await client.get(url, headers=superuser_token_headers)
+    assert response.status_code == status.HTTP_200_OK
+    # The items are deleted with their owner
+    await crud_user.delete(session, owner)
+    response = await client.get(url, headers=superuser_token_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_read_item_conditional(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    item = await create_random_item(session, normal_user.id)
+    url = app.url_path_for("read_item", item_id=item.id)
+    response = await client.get(url, headers=normal_user_token_headers)
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    assert etag.startswith('W/"')
+
+    for conditional in [{"If-None-Match": etag}, {"If-Modified-Since": last_modified}]:
+        response = await client.get(
+            url, headers={**normal_user_token_headers, **conditional}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+    response = await client.get(
+        url,
+        headers={**normal_user_token_headers, "If-None-Match": etag},
+        params={"fields": "title"},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await client.patch(
+        url,
+        headers={**normal_user_token_headers, "If-Match": etag},
+        json={"title": "first"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+    # The first update changed the item since the ETag was read
+    response = await client.patch(
+        url,
+        headers={**normal_user_token_headers, "If-Match": etag},
+        json={"title": "second"},
+    )
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = await client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "first"
+    assert response.headers["ETag"] == new_etag
+
+
+async def test_read_items_conditional(
+    client: AsyncClient,
+    normal_user_token_headers: dict,
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    item = await create_random_item(session, normal_user.id)
+    url = app.url_path_for("read_items")
+    for params in [{}, {"cursor": ""}, {"offset": 1}]:
+        response = await client.get(
+            url, headers=normal_user_token_headers, params=params
+        )
+        etag = response.headers["ETag"]
+        response = await client.get(
+            url,
+            headers={**normal_user_token_headers, "If-None-Match": etag},
+            params=params,
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await client.get(url, headers=normal_user_token_headers)
+    etag = response.headers["ETag"]
+    await crud_item.delete(session, item)
+    response = await client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
@@ -1,12 +1,17 @@
+import asyncio
+
+import pytest
 from fastapi import status
 from httpx import AsyncClient
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
-from app.crud.user import crud_user
+from app.crud.user import crud_user, user_cache
 from app.main import app
-from app.models.user import UserCreate
-from app.tests.utils.utils import random_email, random_lower_string
+from app.models.user import User, UserCreate, UserUpdate
+from app.tests.utils.item import create_random_item
+from app.tests.utils.user import get_user_authentication_headers
+from app.tests.utils.utils import count_queries, random_email, random_lower_string
 
 
 async def test_get_users_superuser_me(
@@ -35,6 +40,42 @@ async def test_get_users_normal_user_me(
     assert current_user["is_superuser"] is False
 
 
+async def test_get_users_me_conditional(
+    client: AsyncClient,
+    normal_user_token_headers: dict[str, str],
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    url = app.url_path_for("read_current_user")
+    r = await client.get(url, headers=normal_user_token_headers)
+    etag = r.headers["ETag"]
+    r = await client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == status.HTTP_304_NOT_MODIFIED
+
+    await crud_user.update(session, normal_user, UserUpdate(first_name="name"))
+    r = await client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["first_name"] == "name"
+
+
+async def test_get_users_me_coalesced(
+    client: AsyncClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    url = app.url_path_for("read_current_user")
+    # Cache the authenticated user
+    await client.get(url, headers=normal_user_token_headers)
+    with count_queries() as statements:
+        responses = await asyncio.gather(
+            *(client.get(url, headers=normal_user_token_headers) for _ in range(5))
+        )
+    assert all(r.status_code == status.HTTP_200_OK for r in responses)
+    assert len(statements) == 1
+
+
 async def test_create_user_new_email(
     client: AsyncClient, superuser_token_headers: dict, session: AsyncSession
 ) -> None:
@@ -117,3 +158,133 @@ async def test_retrieve_users(
     assert len(all_users) > 1
     for item in all_users:
         assert "email" in item
+
+
+async def test_retrieve_user_fields(
+    client: AsyncClient, superuser_token_headers: dict, session: AsyncSession
+) -> None:
+    user_in = UserCreate(email=random_email(), password=random_lower_string())
+    user = await crud_user.create(session, user_in)
+    r = await client.get(
+        app.url_path_for("read_user", user_id=user.id),
+        headers=superuser_token_headers,
+        params={"fields": "id,email"},
+    )
+    assert r.json() == {"id": str(user.id), "email": user.email}
+
+    # Computed fields select the columns they are made of
+    await crud_user.update(
+        session, user, UserUpdate(first_name="Ada", last_name="Lovelace")
+    )
+    r = await client.get(
+        app.url_path_for("read_users"),
+        headers=superuser_token_headers,
+        params={"fields": "id,full_name", "email": user.email},
+    )
+    assert r.json() == [{"id": str(user.id), "full_name": "Ada Lovelace"}]
+
+    r = await client.get(
+        app.url_path_for("read_users"),
+        headers=superuser_token_headers,
+        params={"fields": "email", "cursor": ""},
+    )
+    assert all(item.keys() == {"email"} for item in r.json()["items"])
+
+    r = await client.get(
+        app.url_path_for("read_users"),
+        headers=superuser_token_headers,
+        params={"fields": "hashed_password"},
+    )
+    assert r.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_retrieve_users_expand_items(
+    client: AsyncClient,
+    superuser_token_headers: dict,
+    session: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # The superuser and normal_user fixtures are the same user
+    user_in = UserCreate(email=random_email(), password=random_lower_string())
+    user = await crud_user.create(session, user_in)
+    await crud_user.activate(session, user)
+    user_token_headers = await get_user_authentication_headers(user)
+    items = [await create_random_item(session, user.id) for _ in range(3)]
+    url = app.url_path_for("read_users")
+    with count_queries() as statements:
+        r = await client.get(
+            url, headers=superuser_token_headers, params={"expand": "items"}
+        )
+    assert r.status_code == status.HTTP_200_OK
+    users = {user["id"]: user for user in r.json()}
+    assert len(users[str(user.id)]["items"]) == 3  # noqa: PLR2004
+    # The user snapshot, the users and their items
+    assert len(statements) <= 3  # noqa: PLR2004
+
+    r = await client.get(url, headers=user_token_headers, params={"expand": "items"})
+    assert r.status_code == status.HTTP_403_FORBIDDEN
+    r = await client.get(
+        app.url_path_for("read_user", user_id=user.id),
+        headers=user_token_headers,
+        params={"expand": "items"},
+    )
+    assert len(r.json()["items"]) == 3  # noqa: PLR2004
+
+    # Only the first items are embedded
+    monkeypatch.setattr(settings, "EXPAND_COLLECTION_LIMIT", 2)
+    r = await client.get(
+        url, headers=superuser_token_headers, params={"expand": "items"}
+    )
+    users = {user["id"]: user for user in r.json()}
+    assert [item["id"] for item in users[str(user.id)]["items"]] == [
+        str(item.id) for item in items[:2]
+    ]
+
+
+async def test_retrieve_users_filters(
+    client: AsyncClient, superuser_token_headers: dict, session: AsyncSession
+) -> None:
+    prefix = random_lower_string()
+    user_in = UserCreate(email=f"{prefix}@example.com", password=random_lower_string())
+    user = await crud_user.create(session, user_in)
+    r = await client.get(
+        app.url_path_for("read_users"),
+        headers=superuser_token_headers,
+        params={
+            "email": prefix,
+            "is_active": False,
+            "created_after": user.created_at.isoformat() + "Z",
+            "cursor": "",
+            "estimate_total": True,
+        },
+    )
+    assert r.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in r.json()["items"]] == [str(user.id)]
+    assert int(r.headers["X-Total-Count-Estimate"]) >= 0
+
+    r = await client.get(
+        app.url_path_for("read_users"),
+        headers=superuser_token_headers,
+        params={"email": prefix, "is_active": True},
+    )
+    assert r.json() == []
+
+
+async def test_current_user_is_cached(
+    client: AsyncClient,
+    normal_user_token_headers: dict[str, str],
+    session: AsyncSession,
+    normal_user: User,
+) -> None:
+    # Past the first page, which is served from the item cache
+    url = app.url_path_for("read_items")
+    params = {"offset": 1}
+    await client.get(url, headers=normal_user_token_headers, params=params)
+    with count_queries() as statements:
+        r = await client.get(url, headers=normal_user_token_headers, params=params)
+    assert r.status_code == status.HTTP_200_OK
+    assert len(statements) == 1
+
+    # Updating the user invalidates the cached snapshot
+    await crud_user.update(session, normal_user, UserUpdate(first_name="name"))
+    assert user_cache.get(str(normal_user.id)) is None
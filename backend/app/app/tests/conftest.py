@@ -8,6 +8,7 @@ from sqlmodel import SQLModel, delete
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.crud.item_cache import item_cache
 from app.db.session import SessionLocal, engine
 from app.main import app
 from app.models import *  # noqa: F403
@@ -72,3 +73,9 @@ async def superuser_token_headers(superuser: User) -> dict[str, str]:
 @pytest_asyncio.fixture()
 async def normal_user_token_headers(normal_user: User) -> dict[str, str]:
     return await get_user_authentication_headers(normal_user)
+
+
+@pytest.fixture()
+def _local_item_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Disabled without Redis, in memory is enough for a single process
+    monkeypatch.setattr(item_cache, "ttl", settings.ITEM_CACHE_TTL_SECONDS)
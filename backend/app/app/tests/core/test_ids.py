@@ -0,0 +1,13 @@
+import time
+
+from app.core.ids import uuid7
+
+
+def test_uuid7() -> None:
+    ids = [uuid7() for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    for id_ in ids:
+        assert id_.version == 7  # noqa: PLR2004
+        assert id_.variant == "specified in RFC 4122"
+        assert abs((id_.int >> 80) - time.time() * 1000) < 1000  # noqa: PLR2004
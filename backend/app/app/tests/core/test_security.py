@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.core.security import PasswordHasher, verify_password
+from app.tests.utils.utils import random_lower_string
+
+
+async def test_hash_and_verify_password() -> None:
+    hasher = PasswordHasher(max_workers=2)
+    password = random_lower_string()
+    hashed_password = await hasher.hash(password)
+    assert verify_password(password, hashed_password)
+    assert await hasher.verify(password, hashed_password)
+    assert not await hasher.verify(random_lower_string(), hashed_password)
+    stats = hasher.stats()
+    assert stats.completed == 3  # noqa: PLR2004
+    assert stats.in_flight == 0
+    hasher.shutdown()
+
+
+async def test_password_hasher_rejects_when_queue_is_full() -> None:
+    hasher = PasswordHasher(max_workers=1, max_pending=1)
+    passwords = [random_lower_string() for _ in range(3)]
+    results = await asyncio.gather(
+        *(hasher.hash(password) for password in passwords), return_exceptions=True
+    )
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(rejected) == len(passwords) - 1
+    assert rejected[0].status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert hasher.stats().rejected == len(rejected)
+    hasher.shutdown()
+
+
+async def test_password_hasher_process_pool() -> None:
+    hasher = PasswordHasher(executor="process", max_workers=1)
+    password = random_lower_string()
+    hashed_password = await hasher.hash(password)
+    assert await hasher.verify(password, hashed_password)
+    hasher.shutdown()
+
+
+async def test_password_hasher_holds_cancelled_jobs() -> None:
+    hasher = PasswordHasher(max_workers=1, max_pending=2)
+    running = asyncio.ensure_future(hasher._run(time.sleep, 0.05))  # noqa: SLF001
+    queued = asyncio.ensure_future(hasher._run(time.sleep, 0.05))  # noqa: SLF001
+    await asyncio.sleep(0.01)
+    running.cancel()
+    queued.cancel()
+    await asyncio.sleep(0.01)
+    # The queued job is cancelled, the running one keeps its place until done
+    assert hasher.stats().in_flight == 1
+    await asyncio.sleep(0.1)
+    stats = hasher.stats()
+    assert (stats.in_flight, stats.completed) == (0, 1)
+
+    # Failures are not counted as completed
+    with pytest.raises(ZeroDivisionError):
+        await hasher._run(divmod, 1, 0)  # noqa: SLF001
+    assert hasher.stats().completed == 1
+    hasher.shutdown()
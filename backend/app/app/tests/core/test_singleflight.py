@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+async def test_identical_calls_run_once() -> None:
+    flight = SingleFlight(timeout=1)
+    calls = []
+
+    async def read() -> str:
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return "row"
+
+    results = await asyncio.gather(*(flight.do("key", read) for _ in range(5)))
+    assert results == ["row"] * 5
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert (stats.calls, stats.executions, stats.coalesced) == (5, 1, 4)
+    assert stats.in_flight == 0
+
+
+async def test_waiters_get_the_exception() -> None:
+    flight = SingleFlight(timeout=1)
+
+    async def read() -> str:
+        await asyncio.sleep(0.01)
+        raise LookupError
+
+    results = await asyncio.gather(
+        *(flight.do("key", read) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, LookupError) for result in results)
+
+
+async def test_cancelled_leader_hands_over() -> None:
+    flight = SingleFlight(timeout=1)
+
+    async def read() -> str:
+        await asyncio.sleep(0.01)
+        return "row"
+
+    leader = asyncio.ensure_future(flight.do("key", read))
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(flight.do("key", read)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await asyncio.gather(*waiters) == ["row"] * 3
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert flight.stats().executions == 2  # noqa: PLR2004
+
+
+async def test_waiters_stop_waiting() -> None:
+    flight = SingleFlight(timeout=0.01)
+
+    async def slow_read() -> str:
+        await asyncio.sleep(1)
+        return "slow"
+
+    async def read() -> str:
+        return "row"
+
+    leader = asyncio.ensure_future(flight.do("key", slow_read))
+    await asyncio.sleep(0)
+    assert await flight.do("key", read) == "row"
+    assert flight.stats().timeouts == 1
+    leader.cancel()
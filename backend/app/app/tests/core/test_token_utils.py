@@ -0,0 +1,21 @@
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core.token_utils import TokenType, create_token, decode_token, token_cache
+
+
+def test_decode_token_is_cached() -> None:
+    sub = str(uuid4())
+    token = create_token(sub, settings.ACCESS_TOKEN_EXPIRE_HOURS, TokenType.ACCESS)
+    hits = token_cache.hits
+    assert decode_token(token, TokenType.ACCESS) == sub
+    assert decode_token(token, TokenType.ACCESS) == sub
+    assert token_cache.hits == hits + 1
+    # The token type is still checked for cached tokens
+    assert decode_token(token, TokenType.REFRESH) is None
+
+
+def test_decode_invalid_token_is_not_cached() -> None:
+    size = len(token_cache)
+    assert decode_token("invalid", TokenType.ACCESS) is None
+    assert len(token_cache) == size
@@ -1,9 +1,17 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.crud.item import crud_item
-from app.models.item import ItemCreate, ItemUpdate
-from app.models.user import User
-from app.tests.utils.utils import random_lower_string
+from app.crud.user import crud_user
+from app.models.auth import UserClaims
+from app.models.item import ItemCreate, ItemOut, ItemUpdate
+from app.models.user import User, UserCreate
+from app.tests.utils.item import create_random_item
+from app.tests.utils.utils import (
+    count_queries,
+    explain,
+    random_email,
+    random_lower_string,
+)
 
 
 async def test_create_item(session: AsyncSession, normal_user: User) -> None:
@@ -52,3 +60,106 @@ async def test_delete_item(session: AsyncSession, normal_user: User) -> None:
     item3 = await crud_item.get(session, item.id)
     assert item2 is None
     assert item3 is None
+
+
+async def test_list_by_owner_projection(
+    session: AsyncSession, normal_user: User
+) -> None:
+    items = [await create_random_item(session, normal_user.id) for _ in range(2)]
+    session.expunge_all()
+    rows = await crud_item.list_by_owner(session, normal_user.id, schema=ItemOut)
+    # Plain rows, not entities added to the session
+    assert not session.identity_map
+    assert [ItemOut.model_validate(row, from_attributes=True) for row in rows] == [
+        ItemOut.model_validate(item) for item in items
+    ]
+
+
+async def test_list_by_owner_uses_owner_index(
+    session: AsyncSession, normal_user: User
+) -> None:
+    for _ in range(2):
+        await create_random_item(session, normal_user.id)
+    with count_queries() as statements:
+        await crud_item.list_by_owner(session, normal_user.id)
+        page = await crud_item.page_by_owner(session, normal_user.id, limit=1)
+        await crud_item.page_by_owner(session, normal_user.id, page.next_cursor)
+    for statement in statements:
+        plan = await explain(session, *statement)
+        assert "ix_item_owner_id_created_at_id" in plan
+
+
+async def test_search(session: AsyncSession, normal_user: User) -> None:
+    titles = ["Apple pie", "Banana bread", "Crumble", "Pineapple juice"]
+    items = {}
+    for title in titles:
+        item_in = ItemCreate(
+            title=title, description="with apples" * (title == "Crumble")
+        )
+        items[title] = await crud_item.create_with_owner(
+            session, item_in, normal_user.id
+        )
+    user = UserClaims.model_validate(normal_user, from_attributes=True)
+
+    page = await crud_item.search(session, user, "apples")
+    # Title matches rank above description matches
+    assert [item.title for item in page.items] == ["Apple pie", "Crumble"]
+    page = await crud_item.search(session, user, "banan")
+    assert [item.title for item in page.items] == ["Banana bread"]
+    page = await crud_item.search(session, user, "bread banana")
+    assert [item.title for item in page.items] == ["Banana bread"]
+
+    with count_queries() as statements:
+        first_page = await crud_item.search(session, user, "apples", limit=1)
+        second_page = await crud_item.search(
+            session, user, "apples", first_page.next_cursor, limit=1
+        )
+    assert [item.title for item in first_page.items + second_page.items] == [
+        "Apple pie",
+        "Crumble",
+    ]
+    assert second_page.next_cursor is None
+    # One query per page, the cursor needs no count or lookup
+    assert len(statements) == 2  # noqa: PLR2004
+
+    # Without the owner filter, which could use the owner index instead
+    superuser = user.model_copy(update={"is_superuser": True})
+    with count_queries() as statements:
+        await crud_item.search(session, superuser, "apples")
+    plan = await explain(session, *statements[0])
+    assert "ix_item_search_vector" in plan
+    assert "ix_item_title_trgm" in plan
+
+
+async def test_write_in_single_statement(
+    session: AsyncSession, normal_user: User
+) -> None:
+    item_in = ItemCreate(title=random_lower_string())
+    with count_queries() as statements:
+        item = await crud_item.create_with_owner(session, item_in, normal_user.id)
+        item = await crud_item.update(session, item, ItemUpdate(description="text"))
+    # INSERT ... RETURNING and the item count of the owner, UPDATE ... RETURNING
+    assert len(statements) == 3  # noqa: PLR2004
+    insert, count, update = (statement for statement, _ in statements)
+    assert "RETURNING" in insert
+    assert "item_count" in count
+    assert "RETURNING" in update
+    assert item.description == "text"
+
+
+async def test_count_by_owner(session: AsyncSession) -> None:
+    user_in = UserCreate(email=random_email(), password=random_lower_string())
+    user = await crud_user.create(session, user_in)
+    claims = UserClaims.model_validate(user, from_attributes=True)
+    assert await crud_item.count_by_owner(session, user.id) == 0
+    item = await crud_item.create_with_owner(
+        session, ItemCreate(title=random_lower_string()), user.id
+    )
+    items = await crud_item.bulk_create_with_owner(
+        session, [ItemCreate(title=random_lower_string()) for _ in range(3)], user.id
+    )
+    assert await crud_item.count_by_owner(session, user.id) == 4  # noqa: PLR2004
+    await crud_item.delete(session, item)
+    await crud_item.delete_by_owner(session, items[0].id, claims)
+    await crud_item.bulk_delete_by_owner(session, [items[1].id], claims)
+    assert await crud_item.count_by_owner(session, user.id) == 1
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+
+from app.crud.item_cache import CachedItem, CachedList, ItemCache, MemoryCacheBackend
+
+
+def make_cache() -> ItemCache:
+    return ItemCache(MemoryCacheBackend(100), ttl=60, list_ttl=60, fill_wait=1)
+
+
+async def test_read_through_and_invalidate() -> None:
+    cache = make_cache()
+    owner_id = uuid4()
+    loads = []
+
+    async def load() -> CachedList:
+        loads.append(None)
+        return CachedList(f'W/"{len(loads)}"', f"page {len(loads)}".encode())
+
+    first = CachedList('W/"1"', b"page 1")
+    assert await cache.get_list(owner_id, "list:10", load) == first
+    assert await cache.get_list(owner_id, "list:10", load) == first
+    await cache.invalidate(owner_ids=[owner_id])
+    assert await cache.get_list(owner_id, "list:10", load) == ('W/"2"', b"page 2")
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.fills) == (1, 2, 2)
+
+
+async def test_list_cache_disabled() -> None:
+    cache = ItemCache(MemoryCacheBackend(100), ttl=60, list_ttl=0, fill_wait=1)
+    owner_id = uuid4()
+    loads = []
+
+    async def load() -> CachedList:
+        loads.append(None)
+        return CachedList('W/"1"', b"page")
+
+    for _ in range(2):
+        await cache.get_list(owner_id, "list:10", load)
+    assert len(loads) == 2  # noqa: PLR2004
+    assert cache.stats().fills == 0
+
+
+async def test_evicted_generation_is_reseeded() -> None:
+    # Small enough for reads of another item to evict the generation of the
+    # first one, which is older than its entry
+    cache = ItemCache(MemoryCacheBackend(4), ttl=60, list_ttl=60, fill_wait=1)
+    item_id, other_id, owner_id = uuid4(), uuid4(), uuid4()
+    content = b"v1"
+
+    async def load() -> CachedItem:
+        return CachedItem(owner_id, datetime(2026, 1, 1), content)  # noqa: DTZ001
+
+    await cache.invalidate(item_ids=[item_id])
+    assert (await cache.get_item(item_id, load)).content == b"v1"
+    await cache.get_item(other_id, load)
+    content = b"v2"
+    await cache.invalidate(item_ids=[item_id])
+    assert (await cache.get_item(item_id, load)).content == b"v2"
+
+
+async def test_concurrent_misses_load_once() -> None:
+    cache = make_cache()
+    item_id, owner_id = uuid4(), uuid4()
+    loads = []
+    item = CachedItem(owner_id, datetime.utcnow(), b"{}")  # noqa: DTZ003
+
+    async def load() -> CachedItem:
+        loads.append(None)
+        await asyncio.sleep(0.05)
+        return item
+
+    results = await asyncio.gather(*(cache.get_item(item_id, load) for _ in range(10)))
+    assert results == [item] * 10
+    assert len(loads) == 1
+    assert cache.stats().waits == 9  # noqa: PLR2004
+
+
+async def test_fill_racing_a_write_is_not_served() -> None:
+    cache = make_cache()
+    item_id, owner_id = uuid4(), uuid4()
+    old = CachedItem(owner_id, datetime(2026, 1, 1), b"old")  # noqa: DTZ001
+    new = CachedItem(owner_id, datetime(2026, 1, 2), b"new")  # noqa: DTZ001
+
+    async def load_during_write() -> CachedItem:
+        # The write commits and invalidates while the old row is being loaded
+        await cache.invalidate(item_ids=[item_id])
+        return old
+
+    async def load() -> CachedItem:
+        return new
+
+    assert await cache.get_item(item_id, load_during_write) == old
+    assert await cache.get_item(item_id, load) == new
@@ -3,8 +3,13 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.security import verify_password
 from app.crud.user import crud_user
-from app.models.user import UserCreate, UserUpdatePassword
-from app.tests.utils.utils import random_email, random_lower_string
+from app.models.user import UserCreate, UserFilters, UserUpdatePassword
+from app.tests.utils.utils import (
+    count_queries,
+    explain,
+    random_email,
+    random_lower_string,
+)
 
 
 async def test_create_user(session: AsyncSession) -> None:
@@ -89,3 +94,44 @@ async def test_update_user(session: AsyncSession) -> None:
     assert user_2
     assert user.email == user_2.email
     assert verify_password(new_password, user_2.hashed_password)
+
+
+async def test_filter_users_uses_indexes(session: AsyncSession) -> None:
+    prefix = random_lower_string()
+    for email in [f"{prefix}_a@example.com", f"{prefix.upper()}b@example.com"]:
+        user_in = UserCreate(email=email, password=random_lower_string())
+        await crud_user.create(session, user_in)
+    await crud_user.create(
+        session,
+        UserCreate(email=f"{prefix}a@example.com", password=random_lower_string()),
+        is_superuser=True,
+    )
+    # "_" is not a wildcard
+    filters = UserFilters(email=f"{prefix}_")
+    users = await crud_user.list(session, 0, 100, *crud_user.filter_by(filters))
+    assert [user.email for user in users] == [f"{prefix}_a@example.com"]
+    filters = UserFilters(email=prefix.upper(), is_active=False, is_superuser=True)
+    users = await crud_user.list(session, 0, 100, *crud_user.filter_by(filters))
+    assert [user.email for user in users] == [f"{prefix}a@example.com"]
+
+    for filters, index in [
+        (UserFilters(email=prefix), "ix_user_lower_email"),
+        (UserFilters(is_active=False), "ix_user_inactive_created_at_id"),
+        (UserFilters(is_superuser=True), "ix_user_superuser_created_at_id"),
+    ]:
+        with count_queries() as statements:
+            await crud_user.list(session, 0, 100, *crud_user.filter_by(filters))
+        assert index in await explain(session, *statements[0])
+    assert await crud_user.estimate_count(session, *crud_user.filter_by(filters)) >= 0
+
+
+async def test_get_by_email_ignores_case(session: AsyncSession) -> None:
+    email = random_email()
+    user_in = UserCreate(email=email.upper(), password=random_lower_string())
+    user = await crud_user.create(session, user_in)
+    assert user.email == email.lower()
+    with count_queries() as statements:
+        stored_user = await crud_user.get_by_email(session, email.upper())
+    assert stored_user
+    assert stored_user.id == user.id
+    assert "ix_user_lower_email" in await explain(session, *statements[0])
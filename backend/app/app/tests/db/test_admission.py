@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.admission import AdmissionController, Priority
+
+
+def controller(**kwargs) -> AdmissionController:
+    options = {
+        "capacity": 2,
+        "reserved": 1,
+        "max_queue": 10,
+        "max_wait": 1,
+        "target_delay": 1,
+        "interval": 1,
+    }
+    return AdmissionController(**{**options, **kwargs})
+
+
+async def hold(
+    admission: AdmissionController,
+    priority: Priority,
+    started: list,
+    release: asyncio.Event,
+) -> None:
+    async with admission.admit(priority):
+        started.append(priority)
+        await release.wait()
+
+
+async def test_normal_requests_go_first() -> None:
+    admission = controller(capacity=1, reserved=0)
+    release, started = asyncio.Event(), []
+    first = asyncio.ensure_future(hold(admission, Priority.NORMAL, started, release))
+    await asyncio.sleep(0)
+    waiters = [
+        asyncio.ensure_future(hold(admission, priority, started, release))
+        for priority in (Priority.HEAVY, Priority.NORMAL)
+    ]
+    await asyncio.sleep(0)
+    assert admission.stats().waiting == 2  # noqa: PLR2004
+    release.set()
+    await asyncio.gather(first, *waiters)
+    assert started == [Priority.NORMAL, Priority.NORMAL, Priority.HEAVY]
+    stats = admission.stats()
+    assert (stats.in_flight, stats.admitted, stats.queued) == (0, 3, 2)
+
+
+async def test_sessions_reserved_for_normal_requests() -> None:
+    admission = controller(max_wait=0.01)
+    release, started = asyncio.Event(), []
+    heavy = asyncio.ensure_future(hold(admission, Priority.HEAVY, started, release))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as e:
+        async with admission.admit(Priority.HEAVY):
+            pass
+    assert e.value.status_code == 503  # noqa: PLR2004
+    assert admission.stats().timeouts == 1
+    async with admission.admit():
+        assert admission.stats().in_flight == 2  # noqa: PLR2004
+    release.set()
+    await heavy
+
+
+async def test_full_queue_is_rejected() -> None:
+    admission = controller(capacity=1, reserved=0, max_queue=1)
+    release, started = asyncio.Event(), []
+    tasks = [
+        asyncio.ensure_future(hold(admission, Priority.NORMAL, started, release))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException):
+        async with admission.admit():
+            pass
+    assert admission.stats().rejected == 1
+    release.set()
+    await asyncio.gather(*tasks)
+    assert admission.stats().admitted == 2  # noqa: PLR2004
+
+
+async def test_heavy_requests_are_shed() -> None:
+    admission = controller(capacity=1, reserved=0, target_delay=0.01, interval=0)
+
+    async def slow() -> None:
+        async with admission.admit():
+            await asyncio.sleep(0.05)
+
+    async with admission.admit():
+        tasks = [asyncio.ensure_future(slow()) for _ in range(3)]
+        await asyncio.sleep(0.02)
+    # The second admission is still above the target delay
+    await asyncio.sleep(0.07)
+    assert admission.stats().shedding
+    with pytest.raises(HTTPException):
+        async with admission.admit(Priority.HEAVY):
+            pass
+    assert admission.stats().shed == 1
+    await asyncio.gather(*tasks)
+    # Admitted without waiting, the delay is back below the target
+    async with admission.admit(Priority.HEAVY):
+        assert not admission.stats().shedding
+
+
+async def test_cancelled_waiter_leaves() -> None:
+    admission = controller(capacity=1, reserved=0)
+    release, started = asyncio.Event(), []
+    first = asyncio.ensure_future(hold(admission, Priority.NORMAL, started, release))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(hold(admission, Priority.NORMAL, started, release))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    release.set()
+    await first
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    stats = admission.stats()
+    assert (stats.in_flight, stats.waiting, stats.admitted) == (0, 0, 1)
@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool, PoolMetrics, pool_metrics, warm_up
+
+
+async def test_pool_stats() -> None:
+    engine = create_async_engine(
+        settings.ASYNC_DATABASE_URI,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    metrics = PoolMetrics()
+    metrics.attach(engine)
+    timeouts = pool_metrics.timeouts
+    try:
+        await warm_up(engine)
+        assert metrics.stats(engine.pool).checked_in == 1
+        async with engine.connect():
+            stats = metrics.stats(engine.pool)
+            assert (stats.size, stats.checked_out) == (1, 1)
+            with pytest.raises(sa_exc.TimeoutError):
+                await engine.connect().start()
+    finally:
+        await engine.dispose()
+    assert pool_metrics.timeouts == timeouts + 1
+    stats = metrics.stats(engine.pool)
+    # The warmed up connection was reused
+    assert (stats.connects, stats.closes) == (1, 1)
+
+    totals = pool_metrics.stats(engine.pool)
+    assert totals.wait_histogram["+Inf"] == totals.checkouts
@@ -1,5 +1,13 @@
 import secrets
 import string
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.session import engine
 
 
 def random_lower_string(k=32, alphabet=string.ascii_lowercase) -> str:
@@ -8,3 +16,32 @@ def random_lower_string(k=32, alphabet=string.ascii_lowercase) -> str:
 
 def random_email() -> str:
     return f"{random_lower_string()}@{random_lower_string()}.com"
+
+
+@contextmanager
+def count_queries() -> Iterator[list[tuple[str, Any]]]:
+    """Collect the SQL statements and parameters sent within the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def explain(session: AsyncSession, statement: str, parameters: Any) -> str:
+    """Return the plan of a statement collected by `count_queries`.
+
+    Sequential scans are disabled so that the plan shows the index which would
+    be used on a large table.
+    """
+    connection = await session.connection()
+    await connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    result = await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+    plan = "\n".join(row[0] for row in result)
+    await session.rollback()
+    return plan